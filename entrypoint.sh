@@ -1,7 +1,7 @@
 #!/bin/bash
 
 general_fast_search="${GENERAL_FAST_SEARCH:-true}"
-general_locale="${GENERAL_LOCALE:-en_US}"
+general_locale="[${GENERAL_LOCALE:-en_US}]"
 general_providers="[${GENERAL_PROVIDERS:-'netflix'}]"
 tmdb_api_key="${TMDB_API_KEY}"
 radarr_url="${RADARR_URL:-http://localhost:7878}"
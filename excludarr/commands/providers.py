@@ -4,6 +4,7 @@ from loguru import logger
 
 from excludarr.commands import MyContext
 from excludarr.modules.justwatch import justwatch
+from excludarr.utils.cache import get_metadata_cache
 from excludarr.utils.config import Config
 from excludarr.utils import output
 
@@ -26,7 +27,9 @@ def list(
     if not locale:
         locale = config.locale
 
-    justwatch_client = justwatch.JustWatch(locale)
+    justwatch_client = justwatch.JustWatch(
+        locale, metadata_cache=get_metadata_cache(config)
+    )
     jw_providers = justwatch_client.get_providers()
 
     output.print_providers(jw_providers)
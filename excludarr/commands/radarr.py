@@ -8,6 +8,13 @@ from excludarr.commands import MyContext
 import excludarr.utils.output as output
 
 from excludarr.core.radarr_actions import RadarrActions
+from excludarr.utils.cache import (
+    get_metadata_cache,
+    get_offer_cache,
+    get_resolution_index,
+    get_unmatched_cache,
+)
+from excludarr.utils.justwatch import get_rate_limiter, get_retry_policy
 from excludarr.utils.config import Config, NoConfigException
 from excludarr.utils.enums import Action
 
@@ -51,6 +58,13 @@ def exclude(
     progress: bool = typer.Option(
         False, "--progress", help="Track the progress using a progressbar."
     ),
+    workers: Optional[int] = typer.Option(
+        None,
+        "--workers",
+        metavar="N",
+        min=1,
+        help="Amount of movies to look up at the same time.",
+    ),
 ):
     """
     Radarr exclude function. This function handles the CLI input and determines
@@ -67,6 +81,7 @@ def exclude(
     :param exclusion: Add import exclusion to prevent auto importing the movie again
     :param yes: Skip the confirmation notice and continue without user input
     :param progress: Show a progress bar, only works when no --debug flag is set
+    :param workers: The amount of movies that are looked up at the same time
     :return: None
     """  # noqa: E501
 
@@ -81,6 +96,7 @@ def exclude(
     logger.debug(f"Got CLI values for -e, --exclusion option: {exclusion}")
     logger.debug(f"Got CLI values for -y, --yes option: {yes}")
     logger.debug(f"Got CLI values for --progress option: {progress}")
+    logger.debug(f"Got CLI values for --workers option: {workers}")
 
     context: MyContext = ctx.obj
 
@@ -100,9 +116,23 @@ def exclude(
         providers = config.providers
     if not locale:
         locale = config.locale
+    if not workers:
+        workers = config.radarr_workers
 
     # Setup Radarr Actions to control the different tasks
-    radarr = RadarrActions(config.radarr_url, config.radarr_api_key, locale)
+    offer_cache = get_offer_cache(config)
+    radarr = RadarrActions(
+        config.radarr_url,
+        config.radarr_api_key,
+        locale,
+        offer_cache,
+        get_resolution_index(config),
+        get_unmatched_cache(config),
+        get_retry_policy(config),
+        get_rate_limiter(config),
+        get_metadata_cache(config),
+        workers,
+    )
 
     # Get the movies to exclude and exclude the movies that are in the exclude
     # list
@@ -114,6 +144,15 @@ def exclude(
         disable_progress,
     )
 
+    if offer_cache is not None:
+        logger.debug(f"Offer cache statistics: {offer_cache.stats}")
+    logger.debug(
+        f"JustWatch retry statistics: {radarr.justwatch_client.retry_stats}"
+    )
+    logger.debug(
+        f"JustWatch rate limiter settled at {radarr.justwatch_client.rate_limiter}"  # noqa: E501
+    )
+
     # Only take monitored movies when the action is not-monitored
     if action == Action.not_monitored:
         movies_to_exclude = {
@@ -196,6 +235,13 @@ def re_add(
     progress: bool = typer.Option(
         False, "--progress", help="Track the progress using a progressbar."
     ),
+    workers: Optional[int] = typer.Option(
+        None,
+        "--workers",
+        metavar="N",
+        min=1,
+        help="Amount of movies to look up at the same time.",
+    ),
 ):
     # Debug logging
     logger.debug("Got re-add as subcommand")
@@ -205,6 +251,7 @@ def re_add(
     logger.debug(f"Got CLI values for -l, --locale option: {locale}")
     logger.debug(f"Got CLI values for -y, --yes option: {yes}")
     logger.debug(f"Got CLI values for --progress option: {progress}")
+    logger.debug(f"Got CLI values for --workers option: {workers}")
 
     context: MyContext = ctx.obj
 
@@ -224,9 +271,23 @@ def re_add(
         providers = config.providers
     if not locale:
         locale = config.locale
+    if not workers:
+        workers = config.radarr_workers
 
     # Setup Radarr Actions to control the different tasks
-    radarr = RadarrActions(config.radarr_url, config.radarr_api_key, locale)
+    offer_cache = get_offer_cache(config)
+    radarr = RadarrActions(
+        config.radarr_url,
+        config.radarr_api_key,
+        locale,
+        offer_cache,
+        get_resolution_index(config),
+        get_unmatched_cache(config),
+        get_retry_policy(config),
+        get_rate_limiter(config),
+        get_metadata_cache(config),
+        workers,
+    )
 
     # Get the movies that should be re monitored
     movies_to_re_add = radarr.get_movies_to_re_add(
@@ -237,6 +298,15 @@ def re_add(
         disable_progress,
     )
 
+    if offer_cache is not None:
+        logger.debug(f"Offer cache statistics: {offer_cache.stats}")
+    logger.debug(
+        f"JustWatch retry statistics: {radarr.justwatch_client.retry_stats}"
+    )
+    logger.debug(
+        f"JustWatch rate limiter settled at {radarr.justwatch_client.rate_limiter}"  # noqa: E501
+    )
+
     movies_to_re_add = {
         id: values
         for id, values in movies_to_re_add.items()
@@ -8,6 +8,13 @@ from excludarr.commands import MyContext
 import excludarr.utils.output as output
 
 from excludarr.core.sonarr_actions import SonarrActions
+from excludarr.utils.cache import (
+    get_metadata_cache,
+    get_offer_cache,
+    get_resolution_index,
+    get_unmatched_cache,
+)
+from excludarr.utils.justwatch import get_rate_limiter, get_retry_policy
 from excludarr.utils.config import Config
 from excludarr.utils.enums import Action
 
@@ -51,6 +58,13 @@ def exclude(
     progress: bool = typer.Option(
         False, "--progress", help="Track the progress using a progressbar."
     ),
+    workers: Optional[int] = typer.Option(
+        None,
+        "--workers",
+        metavar="N",
+        min=1,
+        help="Amount of series to look up at the same time.",
+    ),
 ):
     # Debug logging
     logger.debug("Got exclude as subcommand")
@@ -63,6 +77,7 @@ def exclude(
     logger.debug(f"Got CLI values for -e, --exclusion option: {exclusion}")
     logger.debug(f"Got CLI values for -y, --yes option: {yes}")
     logger.debug(f"Got CLI values for --progress option: {progress}")
+    logger.debug(f"Got CLI values for --workers option: {workers}")
 
     context: MyContext = ctx.obj
 
@@ -82,9 +97,26 @@ def exclude(
         providers = config.providers
     if not locale:
         locale = config.locale
+    if not workers:
+        workers = config.sonarr_workers
 
     # Setup Sonarr Actions to control the different tasks
-    sonarr = SonarrActions(config.sonarr_url, config.sonarr_api_key, locale)
+    offer_cache = get_offer_cache(config)
+    sonarr = SonarrActions(
+        config.sonarr_url,
+        config.sonarr_api_key,
+        locale,
+        offer_cache,
+        get_resolution_index(config),
+        get_unmatched_cache(config),
+        get_retry_policy(config),
+        get_rate_limiter(config),
+        get_metadata_cache(config),
+        config.justwatch_episode_page_size,
+        workers,
+        config.sonarr_concurrency,
+        config.tmdb_concurrency,
+    )
 
     series_to_exclude = sonarr.get_series_to_exclude(
         config.sonarr_excludes,
@@ -95,6 +127,15 @@ def exclude(
         tmdb_api_key=config.tmdb_api_key,
     )
 
+    if offer_cache is not None:
+        logger.debug(f"Offer cache statistics: {offer_cache.stats}")
+    logger.debug(
+        f"JustWatch retry statistics: {sonarr.justwatch_client.retry_stats}"
+    )
+    logger.debug(
+        f"JustWatch rate limiter settled at {sonarr.justwatch_client.rate_limiter}"  # noqa: E501
+    )
+
     # Only take monitored seasons and episodes in encounter
     for sonarr_id, values in series_to_exclude.items():
         if delete_files:
@@ -268,6 +309,13 @@ def re_add(
     progress: bool = typer.Option(
         False, "--progress", help="Track the progress using a progressbar."
     ),
+    workers: Optional[int] = typer.Option(
+        None,
+        "--workers",
+        metavar="N",
+        min=1,
+        help="Amount of series to look up at the same time.",
+    ),
 ):
     # Debug logging
     logger.debug("Got exclude as subcommand")
@@ -277,6 +325,7 @@ def re_add(
     logger.debug(f"Got CLI values for -l, --locale option: {locale}")
     logger.debug(f"Got CLI values for -y, --yes option: {yes}")
     logger.debug(f"Got CLI values for --progress option: {progress}")
+    logger.debug(f"Got CLI values for --workers option: {workers}")
 
     context: MyContext = ctx.obj
 
@@ -296,9 +345,26 @@ def re_add(
         providers = config.providers
     if not locale:
         locale = config.locale
+    if not workers:
+        workers = config.sonarr_workers
 
     # Setup Sonarr Actions to control the different tasks
-    sonarr = SonarrActions(config.sonarr_url, config.sonarr_api_key, locale)
+    offer_cache = get_offer_cache(config)
+    sonarr = SonarrActions(
+        config.sonarr_url,
+        config.sonarr_api_key,
+        locale,
+        offer_cache,
+        get_resolution_index(config),
+        get_unmatched_cache(config),
+        get_retry_policy(config),
+        get_rate_limiter(config),
+        get_metadata_cache(config),
+        config.justwatch_episode_page_size,
+        workers,
+        config.sonarr_concurrency,
+        config.tmdb_concurrency,
+    )
 
     series_to_re_add = sonarr.get_series_to_re_add(
         config.sonarr_excludes,
@@ -309,6 +375,15 @@ def re_add(
         tmdb_api_key=config.tmdb_api_key,
     )
 
+    if offer_cache is not None:
+        logger.debug(f"Offer cache statistics: {offer_cache.stats}")
+    logger.debug(
+        f"JustWatch retry statistics: {sonarr.justwatch_client.retry_stats}"
+    )
+    logger.debug(
+        f"JustWatch rate limiter settled at {sonarr.justwatch_client.rate_limiter}"  # noqa: E501
+    )
+
     # Only take not monitored seasons and episodes in encounter
     for _, values in series_to_re_add.items():
         values["episodes"] = [
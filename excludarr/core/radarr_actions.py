@@ -1,82 +1,384 @@
-from typing import Collection, List
+from typing import Collection, Dict, List, Sequence, Tuple
 from loguru import logger
+from pyarr.exceptions import PyarrMethodNotAllowed, PyarrResourceNotFound
 from rich.progress import Progress
 from .utils.patch_pyarr import PatchedRadarrAPI as RadarrAPI
 
 from .utils.filter_entries import filter_entries
+from .utils.scan import scan_entries
 
 import excludarr.utils.filters as filters
 
 from excludarr.modules.justwatch import JustWatch
+from excludarr.modules.justwatch.models import MovieOffers, SearchResult
+from excludarr.modules.justwatch.cache import (
+    MetadataCache,
+    OfferCache,
+    ResolutionIndex,
+    UnmatchedCache,
+)
+from excludarr.modules.justwatch.ratelimit import RateLimiter
+from excludarr.modules.justwatch.retry import RetryPolicy
+
+# The amount of movies changed by a single movie editor request
+MONITOR_CHUNK_SIZE = 250
 
 
 class RadarrActions:
-    def __init__(self, url, api_key, locale):
+    def __init__(
+        self,
+        url,
+        api_key,
+        locale,
+        offer_cache: OfferCache | None = None,
+        resolution_index: ResolutionIndex | None = None,
+        unmatched_cache: UnmatchedCache | None = None,
+        retry_policy: RetryPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        metadata_cache: MetadataCache | None = None,
+        workers: int = 1,
+    ):
         logger.debug("Initializing PyRadarr")
         self.radarr_client = RadarrAPI(url, api_key)
 
         logger.debug(f"Initializing JustWatch API with locale: {locale}")
-        self.justwatch_client = JustWatch(locale)
+        self.justwatch_client = JustWatch(
+            locale,
+            offer_cache=offer_cache,
+            retry_policy=retry_policy,
+            rate_limiter=rate_limiter,
+            metadata_cache=metadata_cache,
+        )
+
+        self.resolution_index = resolution_index
+        self.unmatched_cache = unmatched_cache
+        self.workers = workers
+
+        # The batched search results of the movies of the current chunk and
+        # the offers of the matched movies
+        self._searched: Dict[int, List[SearchResult]] = {}
+        self._offers: Dict[str, MovieOffers | None] = {}
+
+    def _find_movie_in_index(self, tmdb_id, imdb_id):
+        if self.resolution_index is None:
+            return None
+
+        return self.resolution_index.get(
+            "MOVIE", "tmdb", tmdb_id
+        ) or self.resolution_index.get("MOVIE", "imdb", imdb_id)
+
+    def _add_movie_to_index(self, tmdb_id, imdb_id, entry):
+        if self.resolution_index is None:
+            return
+
+        self.resolution_index.set("MOVIE", "tmdb", tmdb_id, entry)
+        self.resolution_index.set("MOVIE", "imdb", imdb_id, entry)
+
+    def _is_unmatched_movie(self, tmdb_id):
+        if self.unmatched_cache is None:
+            return False
+
+        return self.unmatched_cache.should_skip("MOVIE", "tmdb", tmdb_id)
+
+    def _provider_filter(self, providers, fast, exclude):
+        # When excluding, the search only returns the movie if it is
+        # streaming on one of the providers. The search runs in the main
+        # country only, so it can't be narrowed down by provider when the
+        # offers of more countries are checked.
+        if fast and exclude and len(self.justwatch_client.countries) == 1:
+            return {"monetizationTypes": ["FLATRATE"], "packages": providers}
+
+        return {}
+
+    def _is_same_movie(self, movie, entry):
+        imdb_id = movie["imdbId"] if "imdbId" in movie else None
+        tmdb_id = movie["tmdbId"] if "tmdbId" in movie else None
+
+        # TODO: maybe also check year
+        return (imdb_id is not None and imdb_id == entry.imdbId) or (
+            tmdb_id is not None and tmdb_id == entry.tmdbId
+        )
+
+    def _search_year(self, movie, fast):
+        release_year = filters.get_release_date(movie, format="%Y")
+
+        # The release year in Radarr is not always the one JustWatch uses,
+        # allow a year difference
+        if fast and release_year:
+            return (int(release_year) - 1, int(release_year) + 1)
+
+        return None
+
+    def _resolve_movies(
+        self, movies: Sequence[Dict], jw_providers, fast, exclude
+    ):
+        """
+        Search a chunk of movies and query the offers of the matches and the
+        movies in the resolution index in a few batched requests. The
+        searches use the same filter as the search in _find_movie, which uses
+        their results instead of searching again. Only the movies of a failed
+        search or query are looked up one by one.
+        """
+        self._searched = {}
+        self._offers = {}
+
+        indexed = []
+        searches = []
+        for movie in movies:
+            if self._is_unmatched_movie(movie.get("tmdbId")):
+                continue
+
+            entry = self._find_movie_in_index(
+                movie.get("tmdbId"), movie.get("imdbId")
+            )
+            if entry is not None:
+                indexed.append(entry.id)
+            else:
+                searches.append(movie)
+
+        if not indexed and not searches:
+            return
+
+        providers = [
+            values["short_name"] for _, values in jw_providers.items()
+        ]
+
+        logger.debug(
+            f"Searching {len(searches)} movies and querying {len(indexed)} indexed movies in batches"  # noqa: E501
+        )
+
+        try:
+            titles = self.justwatch_client.search_many(
+                [
+                    (movie["title"], "MOVIE", self._search_year(movie, fast))
+                    for movie in searches
+                ],
+                3 if fast else 4,
+                self._provider_filter(providers, fast, exclude),
+            )
+
+            matches = indexed
+            for movie, results in zip(searches, titles):
+                if results is None:
+                    continue
+
+                self._searched[movie["id"]] = results
+                for entry in results:
+                    if self._is_same_movie(movie, entry):
+                        matches.append(entry.id)
+                        break
+
+            self._offers = self.justwatch_client.query_movie_offers_many(
+                matches, providers, lean=True
+            )
+        except Exception as e:
+            logger.warning(f"Could not search the movies in batches: {e}")
 
     def _find_movie(self, movie, jw_providers, fast, exclude):
         # Set the minimal base variables
         title = movie["title"]
         tmdb_id = movie["tmdbId"]
         imdb_id = movie["imdbId"] if "imdbId" in movie else None
-        release_year = filters.get_release_date(movie, format="%Y")
         providers = [
             values["short_name"] for _, values in jw_providers.items()
         ]
 
-        # Set extra payload to narrow down the search if fast is true
-        jw_query_payload = {}
-        if fast:
-            jw_query_payload.update({"page_size": 3})
-
-            if exclude:
-                jw_query_payload.update(
-                    {
-                        "monetization_types": ["flatrate"],
-                        "providers": providers,
-                    }
-                )
+        # Narrow down the search if fast is true
+        results = 3 if fast else 4
+        jw_search_filter = self._provider_filter(providers, fast, exclude)
 
-            if release_year:
-                jw_query_payload.update(
-                    {
-                        "release_year_from": int(release_year),
-                        "release_year_until": int(release_year),
-                    }
+        # Skip the search if the movie has been matched before
+        entry = self._find_movie_in_index(tmdb_id, imdb_id)
+        if entry is not None:
+            logger.debug(
+                f"Found JustWatch ID: {entry.id} for {title} in the resolution index"  # noqa: E501
+            )
+
+            offers = self._offers.get(entry.id)
+            if offers is None:
+                offers = self.justwatch_client.query_movie_offers(
+                    entry.id, providers, lean=True
                 )
 
-        # Log the JustWatch API call function
-        logger.debug(f"Query JustWatch API with title: {title}")
-        titles = self.justwatch_client.search_movie(title)
+            # Search the movie again if the indexed ID doesn't work anymore
+            if offers is not None:
+                return (entry, offers)
+
+        # Use the results of the batched search, its offers are queried by
+        # the batch as well. Otherwise the offers of the results are returned
+        # by the same request as the search.
+        if movie["id"] in self._searched:
+            logger.debug(f"Using the batched search of title: {title}")
+            titles = [
+                (entry, self._offers.get(entry.id))
+                for entry in self._searched[movie["id"]]
+            ]
+        else:
+            logger.debug(f"Query JustWatch API with title: {title}")
+            titles = self.justwatch_client.search_movie_offers(
+                title,
+                results,
+                self._search_year(movie, fast),
+                search_filter=jw_search_filter,
+                providers=providers,
+                lean=True,
+            )
 
         if titles:
-            for entry in titles:
-                jw_imdb_id = entry.imdbId
-                jw_tmdb_id = entry.tmdbId
-
-                # TODO: maybe also check year
-                if (imdb_id is not None and imdb_id == jw_imdb_id) or (
-                    tmdb_id is not None and tmdb_id == jw_tmdb_id
-                ):
+            for entry, offers in titles:
+                if self._is_same_movie(movie, entry):
                     logger.debug(
-                        f"Found JustWatch IMDB ID: {jw_imdb_id} for {title} with Radarr IMDB ID: {imdb_id}"  # noqa: E501
+                        f"Found JustWatch IMDB ID: {entry.imdbId} for {title} with Radarr IMDB ID: {imdb_id}"  # noqa: E501
                     )
 
-                    # TODO: implement fast
+                    self._add_movie_to_index(tmdb_id, imdb_id, entry)
+                    if self.unmatched_cache is not None:
+                        self.unmatched_cache.remove("MOVIE", "tmdb", tmdb_id)
 
-                    # search providers
-                    offers = self.justwatch_client.query_movie_offers(
-                        entry.id, providers
-                    )
+                    if offers is None:
+                        offers = self.justwatch_client.query_movie_offers(
+                            entry.id, providers, lean=True
+                        )
 
                     return (entry, offers)
+
+        # A movie that is not returned by the provider filtered search is
+        # not streaming on any of the providers, there are no offers to query
+        if "packages" in jw_search_filter:
+            logger.debug(f"{title} is not streaming on any of the providers")
+            return None
+
+        # Remember the movies that are not on JustWatch, only if the search
+        # itself succeeded
+        if titles is not None and self.unmatched_cache is not None:
+            self.unmatched_cache.add_failure("MOVIE", "tmdb", tmdb_id)
+
         logger.debug(f"Not found title: {title}")
         return None
 
+    def _movie_to_exclude(
+        self, movie, jw_providers, fast
+    ) -> Tuple[bool, Dict | None]:
+        """
+        Check if a single movie should be excluded. Returns if the movie was
+        skipped and its exclude entry, if it is streaming on a provider.
+        """
+        # Set the minimal base variables
+        title = movie["title"]
+        tmdb_id = movie["tmdbId"] if "tmdbId" in movie else None
+        imdb_id = movie["imdbId"] if "imdbId" in movie else None
+        filesize = movie["sizeOnDisk"]
+        release_date = filters.get_release_date(movie)
+
+        # Log the title and Radarr ID
+        logger.debug(
+            f"Processing title: {title} with Radarr ID: {movie['id']} and IMDB ID: {imdb_id}"  # noqa: E501
+        )
+
+        # Skip the movies that could not be found before
+        if self._is_unmatched_movie(tmdb_id):
+            logger.debug(
+                f"Skipping {title}, it was not found on JustWatch before"
+            )
+            return (True, None)
+
+        # Find the movie
+        find_res = self._find_movie(movie, jw_providers, fast, exclude=True)
+        if find_res is None:
+            return (False, None)
+
+        (found_movie, offers) = find_res
+
+        if found_movie is None or offers is None or len(offers) == 0:
+            return (False, None)
+
+        # Get all the providers the movie is streaming on
+        movie_providers = filters.get_jw_providers(offers)
+
+        # Loop over the configured providers and check if the provider
+        # matches the providers advertised at the movie. If a match is
+        # found return the exclude entry
+        matched_providers = list(
+            set(movie_providers.keys()) & set(jw_providers.keys())
+        )
+
+        if matched_providers is None:
+            return (False, None)
+
+        clear_names = [
+            provider_details["clear_name"]
+            for provider_id, provider_details in jw_providers.items()
+            if provider_id in matched_providers
+        ]
+
+        logger.debug(f"{title} is streaming on {', '.join(clear_names)}")
+
+        return (
+            False,
+            {
+                "title": title,
+                "filesize": filesize,
+                "release_date": release_date,
+                "radarr_object": movie,
+                "tmdb_id": tmdb_id,
+                "jw_id": found_movie.id,
+                "imdb_id": imdb_id,
+                "providers": clear_names,
+            },
+        )
+
+    def _movie_to_re_add(
+        self, movie, jw_providers, fast
+    ) -> Tuple[bool, Dict | None]:
+        """
+        Check if a single movie should be re added. Returns if the movie was
+        skipped and its re-add entry, if it is not streaming on a provider.
+        """
+        # Set the minimal base variables
+        title = movie["title"]
+        tmdb_id = movie["tmdbId"] if "tmdbId" in movie else None
+        imdb_id = movie["imdbId"] if "imdbId" in movie else None
+        release_date = filters.get_release_date(movie)
+
+        # Log the title and Radarr ID
+        logger.debug(
+            f"Processing title: {title} with Radarr ID: {movie['id']} and IMDB ID: {imdb_id}"  # noqa: E501
+        )
+
+        # Skip the movies that could not be found before
+        if self._is_unmatched_movie(tmdb_id):
+            logger.debug(
+                f"Skipping {title}, it was not found on JustWatch before"
+            )
+            return (True, None)
+
+        # Find the movie
+        find_res = self._find_movie(movie, jw_providers, fast, exclude=False)
+        if find_res is None:
+            return (False, None)
+
+        (found_movie, offers) = find_res
+
+        logger.debug(f"{found_movie=}")
+        logger.debug(f"{offers=}")
+
+        if found_movie is None or offers is None or len(offers) != 0:
+            return (False, None)
+
+        logger.debug(f"{title} is not streaming on a configured provider")
+
+        return (
+            False,
+            {
+                "title": title,
+                "release_date": release_date,
+                "radarr_object": movie,
+                "tmdb_id": tmdb_id,
+                "imdb_id": imdb_id,
+                "jw_id": found_movie.id,
+            },
+        )
+
     def get_movies_to_exclude(
         self,
         bl_movies: List,
@@ -86,6 +388,7 @@ class RadarrActions:
         disable_progress=False,
     ):
         exclude_movies = {}
+        skipped = 0
 
         # Get all movies listed in Radarr
         logger.debug("Getting all the movies from Radarr")
@@ -118,69 +421,29 @@ class RadarrActions:
 
         progress = Progress(disable=disable_progress)
         with progress:
-            for movie in progress.track(radarr_movies):
-                # Set the minimal base variables
-                radarr_id = movie["id"]
-                title = movie["title"]
-                tmdb_id = movie["tmdbId"] if "tmdbId" in movie else None
-                imdb_id = movie["imdbId"] if "imdbId" in movie else None
-                filesize = movie["sizeOnDisk"]
-                release_date = filters.get_release_date(movie)
-
-                # Log the title and Radarr ID
-                logger.debug(
-                    f"Processing title: {title} with Radarr ID: {radarr_id} and IMDB ID: {imdb_id}"  # noqa: E501
-                )
-
-                # Find the movie
-                find_res = self._find_movie(
-                    movie, jw_providers, fast, exclude=True
-                )
-                if find_res is None:
-                    continue
-
-                (found_movie, offers) = find_res
-
-                if found_movie is None or offers is None or len(offers) == 0:
-                    continue
-
-                # Get all the providers the movie is streaming on
-                movie_providers = filters.get_jw_providers(offers)
-
-                # Loop over the configured providers and check if the provider
-                # matches the providers advertised at the movie. If a match is
-                # found update the exclude_movies dict
-                matched_providers = list(
-                    set(movie_providers.keys()) & set(jw_providers.keys())
-                )
+            results = scan_entries(
+                radarr_movies,
+                lambda movie: self._movie_to_exclude(
+                    movie, jw_providers, fast
+                ),
+                self.workers,
+                progress,
+                lambda movies: self._resolve_movies(
+                    movies, jw_providers, fast, exclude=True
+                ),
+            )
 
-                if matched_providers is None:
-                    continue
+        # Collect the results in the order of the movies in Radarr
+        for movie, (skipped_movie, entry) in zip(radarr_movies, results):
+            if skipped_movie:
+                skipped += 1
+            elif entry is not None:
+                exclude_movies[movie["id"]] = entry
 
-                clear_names = [
-                    provider_details["clear_name"]
-                    for provider_id, provider_details in jw_providers.items()
-                    if provider_id in matched_providers
-                ]
-
-                exclude_movies.update(
-                    {
-                        radarr_id: {
-                            "title": title,
-                            "filesize": filesize,
-                            "release_date": release_date,
-                            "radarr_object": movie,
-                            "tmdb_id": tmdb_id,
-                            "jw_id": found_movie.id,
-                            "imdb_id": imdb_id,
-                            "providers": clear_names,
-                        }
-                    }
-                )
-
-                logger.debug(
-                    f"{title} is streaming on {', '.join(clear_names)}"
-                )
+        if skipped:
+            logger.info(
+                f"Skipped {skipped} movies that were not found on JustWatch before, they will be searched again later"  # noqa: E501
+            )
 
         logger.debug("Done searching movies to exclude.")
 
@@ -195,6 +458,7 @@ class RadarrActions:
         disable_progress=False,
     ):
         re_add_movies = {}
+        skipped = 0
 
         # Get all movies listed in Radarr and filter it to only include not
         # monitored movies
@@ -229,60 +493,27 @@ class RadarrActions:
 
         progress = Progress(disable=disable_progress)
         with progress:
-            for movie in progress.track(radarr_movies):
-                # Set the minimal base variables
-                radarr_id = movie["id"]
-                title = movie["title"]
-                tmdb_id = movie["tmdbId"] if "tmdbId" in movie else None
-                imdb_id = movie["imdbId"] if "imdbId" in movie else None
-                release_date = filters.get_release_date(movie)
-
-                # Log the title and Radarr ID
-                logger.debug(
-                    f"Processing title: {title} with Radarr ID: {radarr_id} and IMDB ID: {imdb_id}"  # noqa: E501
-                )
-
-                # Find the movie
-                find_res = self._find_movie(
-                    movie, jw_providers, fast, exclude=True
-                )
-                if find_res is None:
-                    continue
-
-                (found_movie, offers) = find_res
-
-                logger.debug(f"{found_movie=}")
-                logger.debug(f"{offers=}")
-
-                if found_movie is None or offers is None or len(offers) != 0:
-                    continue
-
-                # Get all the providers the movie is streaming on
-                movie_providers = filters.get_jw_providers(offers)
-
-                # Check if the JustWatch providers matching the movie providers
-                matched_providers = list(
-                    set(movie_providers.keys()) & set(jw_providers.keys())
-                )
+            results = scan_entries(
+                radarr_movies,
+                lambda movie: self._movie_to_re_add(movie, jw_providers, fast),
+                self.workers,
+                progress,
+                lambda movies: self._resolve_movies(
+                    movies, jw_providers, fast, exclude=False
+                ),
+            )
 
-                if matched_providers is None:
-                    continue
+        # Collect the results in the order of the movies in Radarr
+        for movie, (skipped_movie, entry) in zip(radarr_movies, results):
+            if skipped_movie:
+                skipped += 1
+            elif entry is not None:
+                re_add_movies[movie["id"]] = entry
 
-                re_add_movies.update(
-                    {
-                        radarr_id: {
-                            "title": title,
-                            "release_date": release_date,
-                            "radarr_object": movie,
-                            "tmdb_id": tmdb_id,
-                            "imdb_id": imdb_id,
-                            "jw_id": found_movie.id,
-                        }
-                    }
-                )
-                logger.debug(
-                    f"{title} is not streaming on a configured provider"
-                )
+        if skipped:
+            logger.info(
+                f"Skipped {skipped} movies that were not found on JustWatch before, they will be searched again later"  # noqa: E501
+            )
 
         return re_add_movies
 
@@ -319,29 +550,48 @@ class RadarrActions:
                     "Something went wrong with deleting the movies from Radarr, check the configuration or try --debug for more information"  # noqa: E501
                 )
 
-    def disable_monitored(self, movies):
-        logger.debug(
-            "Starting the process of changing the status to not monitored"
-        )
+    def _set_monitored(self, movies, monitored):
         for movie in movies:
-            movie.update({"monitored": False})
+            movie.update({"monitored": monitored})
+
+        # Flip the movies in a few bulk requests rather than sending every
+        # movie back to Radarr on its own
+        for start in range(0, len(movies), MONITOR_CHUNK_SIZE):
+            chunk = movies[start : start + MONITOR_CHUNK_SIZE]  # noqa: E203
+            ids = [movie["id"] for movie in chunk]
 
+            try:
+                logger.debug(
+                    f"Change monitored to {monitored} for movies with Radarr IDs: {ids}"  # noqa: E501
+                )
+                self.radarr_client.upd_movies(
+                    {"movieIds": ids, "monitored": monitored}
+                )
+            except (PyarrResourceNotFound, PyarrMethodNotAllowed):
+                logger.warning(
+                    "Bulk update is not supported, falling back to updating each movie individually"  # noqa: E501
+                )
+                break
+        else:
+            return
+
+        for movie in movies[start:]:
             logger.debug(
-                f"Change monitored to False for movie with Radarr ID: {movie['id']}"  # noqa: E501
+                f"Change monitored to {monitored} for movie with Radarr ID: {movie['id']}"  # noqa: E501
             )
             self.radarr_client.upd_movie(movie)
 
+    def disable_monitored(self, movies):
+        logger.debug(
+            "Starting the process of changing the status to not monitored"
+        )
+        self._set_monitored(movies, False)
+
     def enable_monitored(self, movies):
         logger.debug(
             "Starting the process of changing the status to monitored"
         )
-        for movie in movies:
-            movie.update({"monitored": True})
-
-            logger.debug(
-                f"Change monitored to True for movie with Radarr ID: {movie['id']}"  # noqa: E501
-            )
-            self.radarr_client.upd_movie(movie)
+        self._set_monitored(movies, True)
 
     def delete_files(self, ids):
         logger.debug("Starting the process of deleting the files")
@@ -1,38 +1,273 @@
-from typing import Collection, Dict, List
+import threading
+
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Collection, Dict, List, Sequence, Tuple
 from loguru import logger
 from rich.progress import Progress
 from .utils.patch_pyarr import PatchedSonarrAPI as SonarrAPI
 
 from excludarr.core.utils.filter_entries import filter_entries
+from excludarr.core.utils.scan import scan_entries
 import excludarr.modules.pytmdb as pytmdb
 import excludarr.utils.filters as filters
+from excludarr.utils.availability import AvailabilityMatrix, ProviderMask
+from excludarr.utils.episodes import EpisodeIndex, SerieEpisodes
 
 from excludarr.modules.justwatch import JustWatch
+from excludarr.modules.justwatch.cache import (
+    MetadataCache,
+    OfferCache,
+    ResolutionIndex,
+    UnmatchedCache,
+)
+from excludarr.modules.justwatch.models import (
+    SearchResult,
+    ShowOffers,
+    iter_episode_offers,
+)
+from excludarr.modules.justwatch.ratelimit import RateLimiter
+from excludarr.modules.justwatch.retry import RetryPolicy
 
 
 class SonarrActions:
     sonarr_client: SonarrAPI
     justwatch_client: JustWatch
-
-    def __init__(self, url, api_key, locale):
+    resolution_index: ResolutionIndex | None
+    unmatched_cache: UnmatchedCache | None
+    episode_page_size: int
+    workers: int
+    sonarr_concurrency: int
+    _episodes_cache: Dict[int, Future]
+    _searched: Dict[int, List[SearchResult]]
+    _offers: Dict[str, ShowOffers | None]
+
+    def __init__(
+        self,
+        url,
+        api_key,
+        locale,
+        offer_cache: OfferCache | None = None,
+        resolution_index: ResolutionIndex | None = None,
+        unmatched_cache: UnmatchedCache | None = None,
+        retry_policy: RetryPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        metadata_cache: MetadataCache | None = None,
+        episode_page_size: int = 100,
+        workers: int = 1,
+        sonarr_concurrency: int = 4,
+        tmdb_concurrency: int = 4,
+    ):
         logger.debug("Initializing PySonarr")
         self.sonarr_client = SonarrAPI(url, api_key, ver_uri="/v3")
 
         logger.debug(f"Initializing JustWatch API with locale: {locale}")
-        self.justwatch_client = JustWatch(locale)
+        self.justwatch_client = JustWatch(
+            locale,
+            offer_cache=offer_cache,
+            retry_policy=retry_policy,
+            rate_limiter=rate_limiter,
+            metadata_cache=metadata_cache,
+        )
+
+        self.resolution_index = resolution_index
+        self.unmatched_cache = unmatched_cache
+        self.episode_page_size = episode_page_size
+
+        # Every backend gets its own concurrency limit, the JustWatch requests
+        # are limited by the rate limiter
+        self.workers = workers
+        self.sonarr_concurrency = sonarr_concurrency
+        self._tmdb_limit = threading.BoundedSemaphore(tmdb_concurrency)
+
+        # Episodes of the series fetched during the current scan, they are
+        # fetched by the pool of the scan and dropped when the next scan
+        # starts
+        self._episodes_cache = {}
+        self._episodes_lock = threading.Lock()
+
+        # The batched search results of the series of the current chunk and
+        # the offers of the matched series
+        self._searched = {}
+        self._offers = {}
+
+    def _find_serie_in_index(self, imdb_id, tvdb_id):
+        if self.resolution_index is None:
+            return None
+
+        return self.resolution_index.get(
+            "SHOW", "imdb", imdb_id
+        ) or self.resolution_index.get("SHOW", "tvdb", tvdb_id)
+
+    def _add_serie_to_index(self, imdb_id, tvdb_id, entry):
+        if self.resolution_index is None:
+            return
+
+        self.resolution_index.set("SHOW", "imdb", imdb_id, entry)
+        self.resolution_index.set("SHOW", "tvdb", tvdb_id, entry)
+
+    def _unmatched_key(self, serie):
+        if serie.get("tvdbId"):
+            return ("SHOW", "tvdb", serie["tvdbId"])
+
+        return ("SHOW", "imdb", serie.get("imdbId", None))
+
+    def _is_unmatched_serie(self, serie):
+        if self.unmatched_cache is None:
+            return False
+
+        return self.unmatched_cache.should_skip(*self._unmatched_key(serie))
+
+    def _add_unmatched_serie(self, serie):
+        if self.unmatched_cache is None:
+            return
+
+        self.unmatched_cache.add_failure(*self._unmatched_key(serie))
+
+    def _remove_unmatched_serie(self, serie):
+        if self.unmatched_cache is None:
+            return
+
+        self.unmatched_cache.remove(*self._unmatched_key(serie))
+
+    def _get_episodes(self, sonarr_id) -> EpisodeIndex:
+        logger.debug(f"Getting the episodes of serie {sonarr_id} from Sonarr")
+
+        return EpisodeIndex(self.sonarr_client.get_episode(sonarr_id, True))
+
+    def _episodes(self, sonarr_id, episodes_pool: Executor) -> Future:
+        """
+        The episodes of a serie, they are only fetched once the serie is
+        found on JustWatch. The fetch is shared by the rest of the scan, only
+        a failed fetch is done again.
+        """
+        with self._episodes_lock:
+            future = self._episodes_cache.get(sonarr_id)
+
+            if future is None or (
+                future.done() and future.exception() is not None
+            ):
+                future = episodes_pool.submit(self._get_episodes, sonarr_id)
+                self._episodes_cache[sonarr_id] = future
+
+        return future
+
+    def _streamed(self, serie):
+        # Long running series are streamed a page of episodes at a time
+        # instead of querying all their offers at once
+        return (
+            self.episode_page_size > 0
+            and serie.get("statistics", {}).get("totalEpisodeCount", 0)
+            > self.episode_page_size
+        )
+
+    def _provider_filter(self, providers, fast, exclude):
+        # When excluding, the search only returns the serie if it is
+        # streaming on one of the providers. The search runs in the main
+        # country only, so it can't be narrowed down by provider when the
+        # offers of more countries are checked.
+        if fast and exclude and len(self.justwatch_client.countries) == 1:
+            return {"monetizationTypes": ["FLATRATE"], "packages": providers}
+
+        return {}
+
+    def _search_year(self, serie, fast):
+        release_year = serie["year"]
+
+        if fast and release_year:
+            return (release_year - 1, release_year + 1)
+
+        return None
+
+    def _resolve_series(
+        self,
+        series: Sequence[Dict],
+        jw_providers,
+        tmdb_api_key,
+        fast,
+        exclude,
+        episodes_pool: Executor,
+    ):
+        """
+        Search a chunk of series and query the offers of the series that are
+        matched by their IMDB ID or in the resolution index in a few batched
+        requests, except for the streamed series. The searches use the same
+        filter as the search in _find_serie, which uses their results instead
+        of searching again. Only the series of a failed search or query are
+        looked up one by one. The episodes of the matched series are fetched
+        from Sonarr in the meantime, ahead of their scan.
+        """
+        self._searched = {}
+        self._offers = {}
+
+        indexed = []
+        searches = []
+        for serie in series:
+            if self._is_unmatched_serie(serie):
+                continue
+
+            show = self._find_serie_in_index(
+                serie.get("imdbId"), serie.get("tvdbId")
+            )
+            if show is not None:
+                self._episodes(serie["id"], episodes_pool)
+                if not (exclude and self._streamed(serie)):
+                    indexed.append(show.id)
+            elif serie.get("imdbId") or (serie.get("tvdbId") and tmdb_api_key):
+                searches.append(serie)
+
+        if not indexed and not searches:
+            return
+
+        providers = [
+            values["short_name"] for _, values in jw_providers.items()
+        ]
+
+        logger.debug(
+            f"Searching {len(searches)} series and querying {len(indexed)} indexed series in batches"  # noqa: E501
+        )
+
+        try:
+            shows = self.justwatch_client.search_many(
+                [
+                    (serie["title"], "SHOW", self._search_year(serie, fast))
+                    for serie in searches
+                ],
+                3 if fast else 4,
+                self._provider_filter(providers, fast, exclude),
+            )
+
+            matches = indexed
+            for serie, results in zip(searches, shows):
+                if results is None:
+                    continue
+
+                self._searched[serie["id"]] = results
+                for entry in results:
+                    if (
+                        serie.get("imdbId")
+                        and entry.imdbId is not None
+                        and (serie["imdbId"] in entry.imdbId)
+                    ):
+                        self._episodes(serie["id"], episodes_pool)
+                        if not (exclude and self._streamed(serie)):
+                            matches.append(entry.id)
+                        break
+
+            # TODO: implement forceFlatrate flag
+            self._offers = self.justwatch_client.query_show_offers_many(
+                matches, providers, True, lean=True
+            )
+        except Exception as e:
+            logger.warning(f"Could not search the series in batches: {e}")
 
     def _find_using_imdb_id(
-        self, title, sonarr_id, imdb_id, fast, jw_query_payload={}
+        self, title, sonarr_id, imdb_id, shows, fast, jw_query_payload={}
     ):
         # Log the title and Sonarr ID
         logger.debug(
             f"Processing title: {title} with Sonarr ID: {sonarr_id} and IMDB ID: {imdb_id}"  # noqa: E501
         )
 
-        # Log the JustWatch API call function
-        logger.debug(f"Query JustWatch API with title: {title}")
-        shows = self.justwatch_client.search_show(title)
-
         if shows:
             for entry in shows:
                 jw_id = entry.id
@@ -56,6 +291,7 @@ class SonarrActions:
         title,
         sonarr_id,
         tvdb_id,
+        jw_shows,
         fast,
         jw_query_payload={},
     ):
@@ -65,19 +301,15 @@ class SonarrActions:
             f"Processing title: {title} with Sonarr ID: {sonarr_id} and TVDB ID: {tvdb_id}"  # noqa: E501
         )
 
-        # Log the JustWatch API call function
-        logger.debug(f"Query JustWatch API with title: {title}")
-
-        jw_shows = self.justwatch_client.search_show(title)
-
         # Get TMDB ID from TMDB using the TVDB ID
         logger.debug(
             f"Trying to obtain the TMDB ID using TVDB ID: {tvdb_id} from TMDB API"  # noqa: E501
         )
         tmdb_id = 0
-        tmdb_find_result = self.tmdb.find.find_by_id(tvdb_id, "tvdb_id").get(
-            "tv_results", []
-        )
+        with self._tmdb_limit:
+            tmdb_find_result = self.tmdb.find.find_by_id(
+                tvdb_id, "tvdb_id"
+            ).get("tv_results", [])
         if tmdb_find_result:
             # Default to 0 if no ID is found
             tmdb_id = int(tmdb_find_result[0].get("id", 0))
@@ -102,26 +334,25 @@ class SonarrActions:
         logger.debug(f"Could not find {title} using TVDB ID: {tvdb_id}")
         return None
 
-    def _find_serie(self, serie, jw_providers, tmdb_api_key, fast, exclude):
+    def _find_serie(
+        self,
+        serie,
+        jw_providers,
+        tmdb_api_key,
+        fast,
+        exclude,
+        with_offers=True,
+    ):
         # Set the minimal base variables
         sonarr_id = serie["id"]
         title = serie["title"]
-        release_year = serie["year"]
         providers = [
             values["short_name"] for _, values in jw_providers.items()
         ]
 
-        # Set extra payload to narrow down the search if fast is true
-        jw_query_payload = {}
-        if fast:
-            jw_query_payload = {
-                "page_size": 3,
-                "release_year_from": release_year,
-                "release_year_until": release_year,
-                "monetization_types": ["flatrate"],
-            }
-            if exclude:
-                jw_query_payload.update({"providers": providers})
+        # Narrow down the search if fast is true
+        results = 3 if fast else 4
+        jw_query_payload = self._provider_filter(providers, fast, exclude)
 
         # Check if there is an IMDB ID, otherwise check if TMDB API is
         # reachable to get the TMDB ID of the movie
@@ -133,28 +364,62 @@ class SonarrActions:
         show = None
         offers = None
 
-        # Setup TMDB if there is an API key provided
-        # TODO: set to init
-        if tmdb_api_key:
-            self.tmdb = pytmdb.TMDB(tmdb_api_key)
+        # Skip the search if the serie has been matched before
+        show = self._find_serie_in_index(imdb_id, tvdb_id)
+        if show is not None:
+            logger.debug(
+                f"Found JustWatch ID: {show.id} for {title} in the resolution index"  # noqa: E501
+            )
+
+            if not with_offers:
+                return show, offers
+
+            offers = self._offers.get(show.id)
+            if offers is None:
+                offers = self.justwatch_client.query_show_offers(
+                    show.id, providers, True, lean=True
+                )
+
+            # Search the serie again if the indexed ID doesn't work anymore
+            if offers is not None:
+                return show, offers
+
+            show = None
+
+        # Use the results of the batched search, otherwise search the serie
+        # once. The results are matched using the IMDB ID and if that fails
+        # using the TVDB ID.
+        jw_shows = None
+        if sonarr_id in self._searched:
+            logger.debug(f"Using the batched search of title: {title}")
+            jw_shows = self._searched[sonarr_id]
+        elif imdb_id or (tvdb_id and tmdb_api_key):
+            # Log the JustWatch API call function
+            logger.debug(f"Query JustWatch API with title: {title}")
+            jw_shows = self.justwatch_client.search_show(
+                title,
+                results,
+                self._search_year(serie, fast),
+                search_filter=jw_query_payload,
+            )
 
         if imdb_id:
             # Try extracting the data by using the IMDB ID
             show = self._find_using_imdb_id(
-                title, sonarr_id, imdb_id, fast, jw_query_payload
+                title, sonarr_id, imdb_id, jw_shows, fast, jw_query_payload
             )
             if not show and tvdb_id and tmdb_api_key:
                 logger.debug(
                     f"Could not find {title} using IMDB, falling back to TMDB"
                 )
                 show = self._find_using_tvdb_id(
-                    title, sonarr_id, tvdb_id, fast
+                    title, sonarr_id, tvdb_id, jw_shows, fast
                 )
         elif tvdb_id and tmdb_api_key:
             # If the user has filled in an TMDB ID fall back to querying
             # TMDB API using the TVDB ID
             show = self._find_using_tvdb_id(
-                title, sonarr_id, tvdb_id, fast, jw_query_payload
+                title, sonarr_id, tvdb_id, jw_shows, fast, jw_query_payload
             )
         else:
             # Skip this serie if no IMDB ID and TVDB ID are found
@@ -162,14 +427,233 @@ class SonarrActions:
                 f"No IMDB ID provided by Sonarr and no TMDB configuration set. Skipping serie: {title}"  # noqa: E501
             )
 
+        # A serie that is not returned by the provider filtered search is not
+        # streaming on any of the providers, there are no offers to query
+        if show is None and "packages" in jw_query_payload:
+            logger.debug(f"{title} is not streaming on any of the providers")
+            return show, offers
+
+        # Remember the series that are not on JustWatch, only if the search
+        # itself succeeded
+        if show is None and jw_shows is not None:
+            self._add_unmatched_serie(serie)
+
         if show:
-            # TODO: implement forceFlatrate flag
-            offers = self.justwatch_client.query_show_offers(
-                show.id, providers, True
-            )
+            self._add_serie_to_index(imdb_id, tvdb_id, show)
+            self._remove_unmatched_serie(serie)
+
+        if show and with_offers:
+            offers = self._offers.get(show.id)
+
+            if offers is None:
+                # TODO: implement forceFlatrate flag
+                offers = self.justwatch_client.query_show_offers(
+                    show.id, providers, True, lean=True
+                )
 
         return show, offers
 
+    def _serie_to_exclude(
+        self,
+        serie,
+        jw_providers,
+        provider_mask: ProviderMask,
+        tmdb_api_key,
+        fast,
+        episodes_pool: Executor,
+    ) -> Tuple[bool, Dict | None, AvailabilityMatrix | None]:
+        """
+        Check which episodes of a single serie should be excluded. Returns if
+        the serie was skipped, its exclude entry and the availability of its
+        episodes.
+        """
+        # Set the minimal base variables
+        sonarr_id = serie["id"]
+        title = serie["title"]
+        filesize = serie.get("statistics", {}).get("sizeOnDisk", 0)
+        release_year = serie["year"]
+        ended = serie["ended"]
+
+        # Skip the series that could not be found before
+        if self._is_unmatched_serie(serie):
+            logger.debug(
+                f"Skipping {title}, it was not found on JustWatch before"
+            )
+            return (True, None, None)
+
+        stream = self._streamed(serie)
+
+        # Get JustWatch serie data
+        (show, offers) = self._find_serie(
+            serie,
+            jw_providers,
+            tmdb_api_key,
+            fast,
+            exclude=True,
+            with_offers=not stream,
+        )
+
+        # Continue if the proper JustWatch ID is found
+        if show is None:
+            return (False, None, None)
+
+        if stream:
+            episode_offers = self.justwatch_client.iter_show_offers(
+                show.id,
+                [v["short_name"] for _, v in jw_providers.items()],
+                True,
+                lean=True,
+                page_size=self.episode_page_size,
+            )
+        elif offers is None or len(offers) == 0:
+            return (False, None, None)
+        else:
+            episode_offers = iter_episode_offers(offers)
+
+        logger.debug(f"Look up season data for {title}")
+
+        entry: Dict | None = None
+        matrix = AvailabilityMatrix()
+
+        try:
+            # Loop over the episodes and check if there are providers
+            for season_number, episode_number, jw_episode in episode_offers:
+                # Check if the providers of the episodes matches the
+                # configured providers
+                episode_mask = provider_mask.of(jw_episode)
+                matrix.set(season_number, episode_number, episode_mask)
+
+                if not episode_mask & provider_mask.all:
+                    continue
+
+                providers_match = provider_mask.names_of(episode_mask)
+
+                # Get the episode data from the information in Sonarr
+                episodes = self._episodes(sonarr_id, episodes_pool).result()
+                sonarr_episode_data = filters.get_episode_data(
+                    episodes, season_number, episode_number
+                )
+                sonarr_episode_id = filters.get_episode_file_id(
+                    episodes, season_number, episode_number
+                )
+
+                if entry is None:
+                    entry = {
+                        "title": title,
+                        "filesize": filesize,
+                        "release_year": release_year,
+                        "ended": ended,
+                        "jw_id": show.id,
+                        "sonarr_object": serie,
+                        "sonarr_file_ids": [],
+                        "episodes": SerieEpisodes(),
+                    }
+
+                entry["sonarr_file_ids"].extend(sonarr_episode_id)
+                entry["episodes"].add(
+                    {
+                        "season": season_number,
+                        "episode": episode_number,
+                        "providers": providers_match,
+                        **sonarr_episode_data,
+                    }
+                )
+
+                logger.debug(
+                    f"{title} S{season_number}E{episode_number} is streaming on {', '.join(providers_match)}"  # noqa: E501
+                )
+        except Exception as e:
+            # Don't exclude a part of the serie if the offers could not be
+            # retrieved completely
+            logger.warning(f"Could not get the offers of {title}: {e}")
+            return (False, None, None)
+
+        return (False, entry, matrix)
+
+    def _serie_to_re_add(
+        self,
+        serie,
+        jw_providers,
+        provider_mask: ProviderMask,
+        tmdb_api_key,
+        fast,
+        episodes_pool: Executor,
+    ) -> Tuple[bool, Dict | None, AvailabilityMatrix | None]:
+        """
+        Check which episodes of a single serie should be re added. Returns if
+        the serie was skipped, its re-add entry and the availability of its
+        episodes.
+        """
+        # Set the minimal base variables
+        sonarr_id = serie["id"]
+        title = serie["title"]
+        release_year = serie["year"]
+        ended = serie["ended"]
+
+        # Skip the series that could not be found before
+        if self._is_unmatched_serie(serie):
+            logger.debug(
+                f"Skipping {title}, it was not found on JustWatch before"
+            )
+            return (True, None, None)
+
+        # Get JustWatch serie data
+        (show, offers) = self._find_serie(
+            serie, jw_providers, tmdb_api_key, fast, exclude=False
+        )
+
+        # Continue if the proper JustWatch ID is found
+        if show is None or offers is None or len(offers) == 0:
+            return (False, None, None)
+
+        logger.debug(f"Look up season data for {title}")
+
+        entry: Dict | None = None
+        matrix = AvailabilityMatrix()
+
+        # Loop over the episodes and check if there are providers
+        for season_number, episode_number, jw_episode in iter_episode_offers(
+            offers
+        ):
+            # Check if the providers of the episodes matches the configured
+            # providers
+            episode_mask = provider_mask.of(jw_episode)
+            matrix.set(season_number, episode_number, episode_mask)
+
+            if episode_mask & provider_mask.all:
+                continue
+
+            # Get the episode data from the information in Sonarr
+            sonarr_episode_data = filters.get_episode_data(
+                self._episodes(sonarr_id, episodes_pool).result(),
+                season_number,
+                episode_number,
+            )
+
+            if entry is None:
+                entry = {
+                    "title": title,
+                    "release_year": release_year,
+                    "ended": ended,
+                    "jw_id": show.id,
+                    "sonarr_object": serie,
+                    "episodes": SerieEpisodes(),
+                }
+
+            entry["episodes"].add(
+                {
+                    "season": season_number,
+                    "episode": episode_number,
+                    **sonarr_episode_data,
+                }
+            )
+
+            logger.debug(
+                f"{title} S{season_number}E{episode_number} is not streaming on a configured provider"  # noqa: E501
+            )
+
+        return (False, entry, matrix)
+
     def get_series_to_exclude(
         self,
         bl_series: List,
@@ -180,6 +664,11 @@ class SonarrActions:
         tmdb_api_key=None,
     ):
         exclude_series: Dict = {}
+        skipped = 0
+
+        # Setup TMDB if there is an API key provided
+        if tmdb_api_key:
+            self.tmdb = pytmdb.TMDB(tmdb_api_key)
 
         # Get all series listed in Sonarr
         logger.debug("Getting all the series from Sonarr")
@@ -207,122 +696,66 @@ class SonarrActions:
             f"Got the following providers: {', '.join([v['clear_name'] for _, v in jw_providers.items()])}"  # noqa: E501
         )
 
-        # TODO: fix this block of code using early exits instead of indenting
-        #       this much
-        progress = Progress(disable=disable_progress)
-        with progress:
-            for serie in progress.track(sonarr_series):
-                # Set the minimal base variables
-                sonarr_id = serie["id"]
-                title = serie["title"]
-                filesize = serie.get("statistics", {}).get("sizeOnDisk", 0)
-                release_year = serie["year"]
-                ended = serie["ended"]
-
-                # Get episodes of the serie
-                episodes = self.sonarr_client.get_episode(sonarr_id, True)
-
-                # Get JustWatch serie data
-                (show, offers) = self._find_serie(
-                    serie, jw_providers, tmdb_api_key, fast, exclude=True
-                )
+        # Episodes are matched against the configured providers using a
+        # bitmask of the providers they stream on
+        provider_mask = ProviderMask(jw_providers)
+        matrices: Dict[int, AvailabilityMatrix] = {}
 
-                # Continue if the proper JustWatch ID is found
-                if show is None or offers is None or len(offers) == 0:
-                    continue
-                logger.debug(f"Look up season data for {title}")
-
-                # Loop over the seasons
-                for jw_season_idx, jw_season in offers.items():
-
-                    logger.debug(
-                        f"Processing season {jw_season_idx} of {title}"
-                    )
-
-                    # Loop over the episodes and check if there are
-                    # providers
-                    for jw_episode_idx, jw_episode in jw_season.items():
-                        season_number = jw_season_idx
-                        episode_number = jw_episode_idx
-
-                        # Get episode providers
-                        episode_providers = filters.get_jw_providers(
-                            jw_episode
-                        )
-
-                        # Check if the providers of the episodes matches
-                        # the configured providers
-                        providers_match = [
-                            provider_details["clear_name"]
-                            for provider_id, provider_details in jw_providers.items()  # noqa: E501
-                            if provider_id in episode_providers.keys()
-                        ]
-
-                        if not providers_match:
-                            continue
-                        # Get the episode data from the information in
-                        # Sonarr
-                        sonarr_episode_data = filters.get_episode_data(
-                            episodes, season_number, episode_number
-                        )
-                        sonarr_episode_id = filters.get_episode_file_id(
-                            episodes, season_number, episode_number
-                        )
-
-                        exclude_series.update(
-                            {
-                                sonarr_id: {
-                                    "title": title,
-                                    "filesize": filesize,
-                                    "release_year": release_year,
-                                    "ended": ended,
-                                    "jw_id": show.id,
-                                    "sonarr_object": serie,
-                                    "sonarr_file_ids": (
-                                        exclude_series[sonarr_id][
-                                            "sonarr_file_ids"
-                                        ]
-                                        + sonarr_episode_id
-                                        if exclude_series.get(sonarr_id)
-                                        else sonarr_episode_id
-                                    ),
-                                    "episodes": (
-                                        exclude_series[sonarr_id]["episodes"]
-                                        + [
-                                            {
-                                                "season": season_number,
-                                                "episode": episode_number,
-                                                "providers": providers_match,
-                                                **sonarr_episode_data,
-                                            }
-                                        ]
-                                        if exclude_series.get(sonarr_id)
-                                        else [
-                                            {
-                                                "season": season_number,
-                                                "episode": episode_number,
-                                                "providers": providers_match,
-                                                **sonarr_episode_data,
-                                            }
-                                        ]
-                                    ),
-                                }
-                            }
-                        )
+        # The series are scanned by the workers, the episodes of the series
+        # found on JustWatch are fetched from Sonarr by a separate pool while
+        # the series are scanned
+        progress = Progress(disable=disable_progress)
+        with progress, ThreadPoolExecutor(
+            max_workers=self.sonarr_concurrency
+        ) as episodes_pool:
+            self._episodes_cache = {}
+            results = scan_entries(
+                sonarr_series,
+                lambda serie: self._serie_to_exclude(
+                    serie,
+                    jw_providers,
+                    provider_mask,
+                    tmdb_api_key,
+                    fast,
+                    episodes_pool,
+                ),
+                self.workers,
+                progress,
+                lambda series: self._resolve_series(
+                    series,
+                    jw_providers,
+                    tmdb_api_key,
+                    fast,
+                    exclude=True,
+                    episodes_pool=episodes_pool,
+                ),
+            )
 
-                        logger.debug(
-                            f"{title} S{season_number}E{episode_number} is streaming on {', '.join(providers_match)}"  # noqa: E501
-                        )
+        # Collect the results in the order of the series in Sonarr
+        for serie, (skipped_serie, entry, matrix) in zip(
+            sonarr_series, results
+        ):
+            if skipped_serie:
+                skipped += 1
+            elif entry is not None and matrix is not None:
+                exclude_series[serie["id"]] = entry
+                matrices[serie["id"]] = matrix
+
+        if skipped:
+            logger.info(
+                f"Skipped {skipped} series that were not found on JustWatch before, they will be searched again later"  # noqa: E501
+            )
 
         # Check if the full season could be excluded rather than seperate
         # episodes
         for exclude_id, exclude_entry in exclude_series.items():
             sonarr_object = exclude_entry["sonarr_object"]
             sonarr_seasons = sonarr_object["seasons"]
-            exclude_episodes = exclude_entry["episodes"]
+            exclude_episodes: SerieEpisodes = exclude_entry["episodes"]
+            matrix = matrices[exclude_id]
 
             seasons_to_exclude = []
-            season_numbers = []
+            season_numbers = set()
 
             # Loop over the seasons registerd in Sonarr
             for season in sonarr_seasons:
@@ -336,24 +769,19 @@ class SonarrActions:
                 sonarr_season_number = int(season["seasonNumber"])
 
                 # Get the total amount of episodes
-                exclude_total_episodes = [
-                    episode
-                    for episode in exclude_episodes
-                    if episode["season"] == sonarr_season_number
-                ]
+                exclude_total_episodes = matrix.streaming_count(
+                    sonarr_season_number, provider_mask.all
+                )
 
                 # Get a list of providers of the season
-                season_providers = [
-                    episode["providers"]
-                    for episode in exclude_episodes
-                    if episode["season"] == sonarr_season_number
-                ]
-                season_providers = filters.flatten(season_providers)
+                season_providers = provider_mask.names_of(
+                    matrix.season_mask(sonarr_season_number)
+                )
 
                 # Check if the amount of episodes to exclude is greater or
                 # equal the total episodes in Sonarr
-                if len(exclude_total_episodes) >= sonarr_total_episodes:
-                    season_numbers.append(sonarr_season_number)
+                if exclude_total_episodes >= sonarr_total_episodes:
+                    season_numbers.add(sonarr_season_number)
                     seasons_to_exclude.append(
                         {
                             "season": sonarr_season_number,
@@ -365,11 +793,9 @@ class SonarrActions:
 
             # Re order the exclude_series dict to strip the episodes if the
             # whole season can be excluded
-            updated_exclude_episodes = [
-                episode
-                for episode in exclude_episodes
-                if episode["season"] not in season_numbers
-            ]
+            updated_exclude_episodes = exclude_episodes.without_seasons(
+                season_numbers
+            )
             exclude_series[exclude_id]["episodes"] = updated_exclude_episodes
             exclude_series[exclude_id]["seasons"] = seasons_to_exclude
             exclude_series[exclude_id]["providers"] = (
@@ -392,6 +818,7 @@ class SonarrActions:
         tmdb_api_key=None,
     ):
         re_add_series: Dict = {}
+        skipped = 0
 
         # Setup TMDB if there is an API key provided
         if tmdb_api_key:
@@ -423,105 +850,66 @@ class SonarrActions:
             f"Got the following providers: {', '.join([v['clear_name'] for _, v in jw_providers.items()])}"  # noqa: E501
         )
 
-        progress = Progress(disable=disable_progress)
-        with progress:
-            for serie in progress.track(sonarr_series):
-                # Set the minimal base variables
-                sonarr_id = serie["id"]
-                title = serie["title"]
-                release_year = serie["year"]
-                ended = serie["ended"]
-
-                # Get episodes of the serie
-                episodes = self.sonarr_client.get_episode(sonarr_id, True)
-
-                # Get JustWatch serie data
-                (show, offers) = self._find_serie(
-                    serie, jw_providers, tmdb_api_key, fast, exclude=True
-                )
-
-                # Continue if the proper JustWatch ID is found
-                if show is None or offers is None or len(offers) == 0:
-                    continue
-
-                logger.debug(f"Look up season data for {title}")
+        # Episodes are matched against the configured providers using a
+        # bitmask of the providers they stream on
+        provider_mask = ProviderMask(jw_providers)
+        matrices: Dict[int, AvailabilityMatrix] = {}
 
-                # Loop over the seasons
-                for jw_season_idx, jw_season in offers.items():
-
-                    logger.debug(
-                        f"Processing season {jw_season_idx} of {title}"
-                    )
-
-                    # Loop over the episodes and check if there are providers
-                    for jw_episode_idx, jw_episode in jw_season.items():
-                        season_number = jw_season_idx
-                        episode_number = jw_episode_idx
-
-                        # Get episode providers
-                        episode_providers = filters.get_jw_providers(
-                            jw_episode
-                        )
-
-                        # Check if the providers of the episodes matches the
-                        # configured providers
-                        providers_match = [
-                            provider_details["clear_name"]
-                            for provider_id, provider_details in jw_providers.items()  # noqa: E501
-                            if provider_id in episode_providers.keys()
-                        ]
-
-                        if providers_match:
-                            continue
-
-                        # Get the episode data from the information in Sonarr
-                        sonarr_episode_data = filters.get_episode_data(
-                            episodes, season_number, episode_number
-                        )
-
-                        re_add_series.update(
-                            {
-                                sonarr_id: {
-                                    "title": title,
-                                    "release_year": release_year,
-                                    "ended": ended,
-                                    "jw_id": show.id,
-                                    "sonarr_object": serie,
-                                    "episodes": (
-                                        re_add_series[sonarr_id]["episodes"]
-                                        + [
-                                            {
-                                                "season": season_number,
-                                                "episode": episode_number,
-                                                **sonarr_episode_data,
-                                            }
-                                        ]
-                                        if re_add_series.get(sonarr_id)
-                                        else [
-                                            {
-                                                "season": season_number,
-                                                "episode": episode_number,
-                                                **sonarr_episode_data,
-                                            }
-                                        ]
-                                    ),
-                                }
-                            }
-                        )
+        # The series are scanned by the workers, the episodes of the series
+        # found on JustWatch are fetched from Sonarr by a separate pool while
+        # the series are scanned
+        progress = Progress(disable=disable_progress)
+        with progress, ThreadPoolExecutor(
+            max_workers=self.sonarr_concurrency
+        ) as episodes_pool:
+            self._episodes_cache = {}
+            results = scan_entries(
+                sonarr_series,
+                lambda serie: self._serie_to_re_add(
+                    serie,
+                    jw_providers,
+                    provider_mask,
+                    tmdb_api_key,
+                    fast,
+                    episodes_pool,
+                ),
+                self.workers,
+                progress,
+                lambda series: self._resolve_series(
+                    series,
+                    jw_providers,
+                    tmdb_api_key,
+                    fast,
+                    exclude=False,
+                    episodes_pool=episodes_pool,
+                ),
+            )
 
-                        logger.debug(
-                            f"{title} S{season_number}E{episode_number} is not streaming on a configured provider"  # noqa: E501
-                        )
+        # Collect the results in the order of the series in Sonarr
+        for serie, (skipped_serie, entry, matrix) in zip(
+            sonarr_series, results
+        ):
+            if skipped_serie:
+                skipped += 1
+            elif entry is not None and matrix is not None:
+                re_add_series[serie["id"]] = entry
+                matrices[serie["id"]] = matrix
+
+        if skipped:
+            logger.info(
+                f"Skipped {skipped} series that were not found on JustWatch before, they will be searched again later"  # noqa: E501
+            )
 
         # Check if the full season could be excluded rather than seperate
         # episodes
         for re_add_id, re_add_entry in re_add_series.items():
             sonarr_object = re_add_entry["sonarr_object"]
             sonarr_seasons = sonarr_object["seasons"]
-            re_add_episodes = re_add_entry["episodes"]
+            re_add_episodes: SerieEpisodes = re_add_entry["episodes"]
+            matrix = matrices[re_add_id]
 
             seasons_to_re_add = []
-            season_numbers = []
+            season_monitored: Dict[int, bool] = {}
 
             # Loop over the seasons registerd in Sonarr
             for season in sonarr_seasons:
@@ -532,16 +920,16 @@ class SonarrActions:
                 sonarr_season_number = int(season["seasonNumber"])
 
                 # Get the total amount of episodes
-                re_add_total_episodes = [
-                    episode
-                    for episode in re_add_episodes
-                    if episode["season"] == sonarr_season_number
-                ]
+                re_add_total_episodes = matrix.missing_count(
+                    sonarr_season_number, provider_mask.all
+                )
 
                 # Check if the amount of episodes to exclude is greater or
                 # equals the total episodes in Sonarr
-                if len(re_add_total_episodes) >= sonarr_total_episodes:
-                    season_numbers.append(sonarr_season_number)
+                if re_add_total_episodes >= sonarr_total_episodes:
+                    season_monitored[sonarr_season_number] = (
+                        sonarr_season_monitored
+                    )
                     seasons_to_re_add.append(
                         {
                             "season": sonarr_season_number,
@@ -553,26 +941,18 @@ class SonarrActions:
             # whole season can be excluded or if the episode is not monitored
             # but the season is
             updated_re_add_episodes = []
-            for episode in re_add_episodes:
-                episode_season = episode["season"]
-                episode_monitored = episode.get("monitored", True)
-                season_monitored = [
-                    season["monitored"]
-                    for season in seasons_to_re_add
-                    if season["season"] == episode_season
-                ]
-
-                if all(season_monitored) and not episode_monitored:
-                    updated_re_add_episodes.append(episode)
-                elif episode_season not in season_numbers:
-                    updated_re_add_episodes.append(episode)
+            for season_number, episodes in re_add_episodes.seasons.items():
+                if season_number not in season_monitored:
+                    updated_re_add_episodes.extend(episodes)
+                elif season_monitored[season_number]:
+                    updated_re_add_episodes.extend(
+                        episode
+                        for episode in episodes
+                        if not episode.get("monitored", True)
+                    )
 
             # Save all episode IDs in case we need to re add the whole serie
-            all_episode_ids = [
-                episode["episode_id"]
-                for episode in re_add_episodes
-                if episode.get("episode_id", False)
-            ]
+            all_episode_ids = re_add_episodes.episode_ids()
 
             re_add_series[re_add_id]["all_episode_ids"] = all_episode_ids
             re_add_series[re_add_id]["episodes"] = updated_re_add_episodes
@@ -1,12 +1,53 @@
 from typing import Any, Optional, Union
 from pyarr import RadarrAPI, SonarrAPI
+from pyarr.exceptions import PyarrConnectionError
+from pyarr.request_handler import RequestHandler, _process_response
 from pyarr.types import JsonObject, JsonArray
-from requests import Response
+from requests import Response, Timeout
+
+from excludarr.modules.justwatch.decoder import loads
 
 # WARNING: This is a temporary fix until pyarr is updated
 
+# Endpoints that return the whole library, these documents can be tens of
+# megabytes so they are decoded with the fast JSON decoder
+FAST_JSON_PATHS = ("movie", "series", "episode")
+
+
+def _fast_get(
+    api: RequestHandler,
+    path: str,
+    ver_uri: str = "",
+    params: Union[dict[str, Any], list[tuple[str, Any]], None] = None,
+) -> Any:
+    headers = {"X-Api-Key": api.api_key}
+    try:
+        res = api.session.get(
+            api._request_url(path, ver_uri),
+            headers=headers,
+            params=params,
+            auth=api.auth,
+        )
+    except Timeout as exception:
+        raise PyarrConnectionError(
+            "Timeout occurred while connecting to API."
+        ) from exception
+
+    content_type = res.headers.get("Content-Type", "")
+    if res.status_code == 200 and "application/json" in content_type:
+        return loads(res.content)
+
+    # Let pyarr raise the matching error
+    return _process_response(res)
+
 
 class PatchedSonarrAPI(SonarrAPI):
+    def _get(self, path, ver_uri="", params=None):
+        if path not in FAST_JSON_PATHS:
+            return super()._get(path, ver_uri, params)
+
+        return _fast_get(self, path, ver_uri, params)
+
     # GET /episode
     def get_episode(
         self, id_: int, series: bool = False, season: int | None = None
@@ -79,6 +120,11 @@ class PatchedSonarrAPI(SonarrAPI):
 
 
 class PatchedRadarrAPI(RadarrAPI):
+    def _get(self, path, ver_uri="", params=None):
+        if path not in FAST_JSON_PATHS:
+            return super()._get(path, ver_uri, params)
+
+        return _fast_get(self, path, ver_uri, params)
 
     def upd_movie(
         self,
@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Sequence, TypeVar
+from rich.progress import Progress
+from loguru import logger
+
+E = TypeVar("E")
+R = TypeVar("R")
+
+# Amount of entries that are looked up together before they are scanned
+RESOLVE_CHUNK_SIZE = 100
+
+
+def scan_entries(
+    entries: Sequence[E],
+    scan_entry: Callable[[E], R],
+    workers: int,
+    progress: Progress,
+    resolve: Callable[[Sequence[E]], None] | None = None,
+    chunk_size: int = RESOLVE_CHUNK_SIZE,
+) -> List[R]:
+    """
+    Run scan_entry for every entry using a pool of workers. The results are
+    returned in the order of the entries, no matter in which order they were
+    scanned, and the progress bar advances every time an entry is done. The
+    entries are scanned a chunk at a time, resolve is called with every chunk
+    before it is scanned so the chunk can be looked up in batched requests.
+    """
+    task = progress.add_task("Working...", total=len(entries))
+    results: List[R] = []
+
+    if workers > 1:
+        logger.debug(f"Scanning {len(entries)} entries with {workers} workers")
+
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for start in range(0, len(entries), chunk_size):
+            chunk = entries[start : start + chunk_size]  # noqa: E203
+
+            if resolve is not None:
+                resolve(chunk)
+
+            if executor is None:
+                for entry in chunk:
+                    results.append(scan_entry(entry))
+                    progress.advance(task)
+                continue
+
+            chunk_results: List[R] = [None] * len(chunk)  # type: ignore
+            futures = {
+                executor.submit(scan_entry, entry): i
+                for i, entry in enumerate(chunk)
+            }
+
+            for future in as_completed(futures):
+                chunk_results[futures[future]] = future.result()
+                progress.advance(task)
+
+            results.extend(chunk_results)
+    finally:
+        # Don't start the remaining entries when one of them failed
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return results
@@ -1 +1,6 @@
 from .justwatch import JustWatch  # noqa
+from .async_justwatch import AsyncJustWatch  # noqa
+from .cache import MetadataCache  # noqa
+from .cache import OfferCache  # noqa
+from .cache import ResolutionIndex  # noqa
+from .cache import UnmatchedCache  # noqa
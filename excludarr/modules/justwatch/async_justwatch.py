@@ -0,0 +1,332 @@
+import asyncio
+import time
+
+from typing import Any, AsyncIterator, Dict, List, Tuple
+import httpx
+
+from .base import BaseJustWatch, Flow, SearchQuery, T, Year
+from .cache import MetadataCache, OfferCache
+from .models import (
+    EpisodeOffers,
+    MovieOffers,
+    SearchResult,
+    ShowOffers,
+    iter_episode_offers,
+)
+from .ratelimit import AsyncConcurrencyGate, RateLimiter
+from .retry import RetryPolicy, Sleep
+from .singleflight import AsyncSingleFlight
+
+
+class AsyncJustWatch(BaseJustWatch):
+    """
+    Asyncio version of the JustWatch client. It exposes the same methods as
+    JustWatch but as coroutines, at most max_concurrency requests are in
+    flight at the same time, they are all multiplexed over the HTTP/2
+    connection of the client. Within that maximum the rate limiter decides
+    how many requests are sent concurrently.
+
+    The locale is resolved lazily on the first call, the client can be used
+    as an async context manager to resolve it up front and to close the
+    connection when done. The countries are only known once the locale is
+    resolved.
+    """
+
+    httpx_client: httpx.AsyncClient
+
+    def __init__(
+        self,
+        locale: str | List[str],
+        ssl_verify: bool = True,
+        max_concurrency: int = 16,
+        offer_cache: OfferCache | None = None,
+        retry_policy: RetryPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        metadata_cache: MetadataCache | None = None,
+    ):
+        super().__init__(
+            offer_cache,
+            retry_policy,
+            rate_limiter or RateLimiter(max_concurrency=max_concurrency),
+            metadata_cache,
+        )
+
+        self.httpx_client = httpx.AsyncClient(
+            http2=True,
+            verify=ssl_verify,
+            limits=httpx.Limits(max_connections=max_concurrency),
+        )
+        # Hard cap on the requests in flight, also when the rate limiter
+        # allows more or is shared with other clients
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._gate = AsyncConcurrencyGate(self.rate_limiter)
+        self._single_flight = AsyncSingleFlight()
+
+        self._requested_locale = locale
+        self._locale_lock = asyncio.Lock()
+        self._locale_resolved = False
+
+    async def __aenter__(self):
+        await self._ensure_locale()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.httpx_client.aclose()
+
+    async def _run(self, flow: Flow[T]) -> T:
+        response: Any = None
+        error: Exception | None = None
+
+        while True:
+            try:
+                if error is not None:
+                    request = flow.throw(error)
+                else:
+                    request = flow.send(response)
+            except StopIteration as stop:
+                return stop.value
+
+            response, error = None, None
+            if isinstance(request, Sleep):
+                await asyncio.sleep(request.seconds)
+                continue
+
+            # Concurrent tasks requesting the same thing share a request
+            try:
+                response = await self._single_flight.do(
+                    self._coalesce_key(request),
+                    lambda: self._send(request),
+                )
+            except Exception as e:
+                error = e
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.rate_limiter.reserve())
+
+        async with self._semaphore, self._gate:
+            started = time.monotonic()
+            response = None
+            try:
+                response = await self.httpx_client.send(request)
+                return response
+            finally:
+                self.rate_limiter.record(
+                    time.monotonic() - started,
+                    throttled=response is not None
+                    and response.status_code == 429,
+                )
+
+    async def _ensure_locale(self):
+        if self._locale_resolved:
+            return
+
+        async with self._locale_lock:
+            if self._locale_resolved:
+                return
+
+            # Setup locale by verifying its input, the offers are queried in
+            # all the given locales
+            locales = self._requested_locale
+            if isinstance(locales, str):
+                locales = [locales]
+
+            full_locales = [
+                await self._run(self._full_locale_flow(locale))
+                for locale in locales
+            ]
+            self._set_locale(full_locales[0], full_locales[1:])
+            self._locale_resolved = True
+
+    async def get_providers(self):
+        await self._ensure_locale()
+
+        return await self._run(self._providers_flow())
+
+    async def query_movie_offers(
+        self,
+        jwid: str,
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> MovieOffers | None:
+        await self._ensure_locale()
+
+        try:
+            return await self._run(
+                self._movie_offers_flow(jwid, providers, forceFlatrate, lean)
+            )
+        except Exception:
+            return None
+
+    async def query_show_offers(
+        self,
+        jwid: str,
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> ShowOffers | None:
+        await self._ensure_locale()
+
+        try:
+            return await self._run(
+                self._show_offers_flow(jwid, providers, forceFlatrate, lean)
+            )
+        except Exception:
+            return None
+
+    async def iter_show_offers(
+        self,
+        jwid: str,
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+        page_size: int = 100,
+    ) -> AsyncIterator[EpisodeOffers]:
+        await self._ensure_locale()
+
+        cached = self._cached_show_offers(jwid, providers, forceFlatrate, lean)
+        if cached is not None:
+            for episode in iter_episode_offers(cached):
+                yield episode
+            return
+
+        seasons = await self._run(
+            self._paged_show_seasons_flow(jwid, providers, forceFlatrate, lean)
+        )
+
+        show_seasons = []
+        for season in seasons:
+            if not self._is_partial_season(season):
+                episodes = self._season_episodes(season)
+                for episode in self._parse_episode_page(season, episodes):
+                    yield episode
+            else:
+                episodes = []
+                offset = 0
+                while True:
+                    page = await self._run(
+                        self._season_episodes_page_flow(
+                            season["id"],
+                            offset,
+                            page_size,
+                            providers,
+                            forceFlatrate,
+                            lean,
+                        )
+                    )
+                    episodes.extend(page)
+
+                    for episode in self._parse_episode_page(season, page):
+                        yield episode
+
+                    if len(page) < page_size:
+                        break
+                    offset += page_size
+
+            show_seasons.append(
+                {"content": season["content"], "episodes": episodes}
+            )
+
+        self._store_show_offers(
+            jwid, providers, forceFlatrate, lean, show_seasons
+        )
+
+    async def query_movie_offers_many(
+        self,
+        jwids: List[str],
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> Dict[str, MovieOffers | None]:
+        await self._ensure_locale()
+
+        return await self._run(
+            self._movie_offers_many_flow(jwids, providers, forceFlatrate, lean)
+        )
+
+    async def query_show_offers_many(
+        self,
+        jwids: List[str],
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> Dict[str, ShowOffers | None]:
+        await self._ensure_locale()
+
+        return await self._run(
+            self._show_offers_many_flow(jwids, providers, forceFlatrate, lean)
+        )
+
+    async def search_movie(
+        self,
+        title: str,
+        results=4,
+        year: Year | None = None,
+        search_filter: Dict[str, Any] | None = None,
+    ) -> list[SearchResult] | None:
+        await self._ensure_locale()
+
+        try:
+            return await self._run(
+                self._search_flow(title, "MOVIE", results, year, search_filter)
+            )
+        except Exception:
+            return None
+
+    async def search_movie_offers(
+        self,
+        title: str,
+        results=4,
+        year: Year | None = None,
+        search_filter: Dict[str, Any] | None = None,
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> list[Tuple[SearchResult, MovieOffers]] | None:
+        await self._ensure_locale()
+
+        try:
+            return await self._run(
+                self._search_movie_offers_flow(
+                    title,
+                    results,
+                    year,
+                    search_filter,
+                    providers,
+                    forceFlatrate,
+                    lean,
+                )
+            )
+        except Exception:
+            return None
+
+    async def search_show(
+        self,
+        title: str,
+        results=4,
+        year: Year | None = None,
+        search_filter: Dict[str, Any] | None = None,
+    ) -> list[SearchResult] | None:
+        await self._ensure_locale()
+
+        try:
+            return await self._run(
+                self._search_flow(title, "SHOW", results, year, search_filter)
+            )
+        except Exception:
+            return None
+
+    async def search_many(
+        self,
+        searches: List[SearchQuery],
+        results=4,
+        search_filter: Dict[str, Any] | None = None,
+    ) -> List[list[SearchResult] | None]:
+        await self._ensure_locale()
+
+        return await self._run(
+            self._search_many_flow(searches, results, search_filter)
+        )
@@ -1,3 +1,1253 @@
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Hashable,
+    List,
+    Set,
+    Tuple,
+    TypeAlias,
+    TypeVar,
+)
+from json import dumps
+import httpx
+
+
+from .batching import AdaptiveBatchSize
+from .cache import MetadataCache, OfferCache
+from .decoder import DecodeError, loads
+from .exceptions import (
+    JustWatchBadJSON,
+    JustWatchGraphqlError,
+    JustWatchIncompleteResponse,
+    JustWatchServerError,
+    JustWatchTooManyRequests,
+    JustWatchForbidden,
+    JustWatchNotFound,
+    JustWatchBadRequest,
+)
+from .models import (
+    EpisodeOffers,
+    MovieOffers,
+    SearchResult,
+    Offer,
+    ShowOffers,
+)
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy, RetryStats, Sleep
+
+JSON: TypeAlias = (
+    dict[str, "JSON"] | list["JSON"] | str | int | float | bool | None
+)
+
+T = TypeVar("T")
+K = TypeVar("K")
+
+# A release year or a (min, max) range of release years
+Year: TypeAlias = int | Tuple[int, int]
+
+# Title, objectType (MOVIE or SHOW) and optional release year of a search
+SearchQuery: TypeAlias = Tuple[str, str, Year | None]
+
+# A flow yields the requests it needs to have sent and receives the
+# responses back, it returns the parsed result of the whole operation. It can
+# also yield a Sleep to wait before sending the next request.
+Flow: TypeAlias = Generator[httpx.Request | Sleep, Any, T]
+
+
 class Manager(object):
     def __init__(self, client):
         self.client = client
+
+
+class BaseJustWatch(object):
+    """
+    Base of the JustWatch clients. All the request building and response
+    parsing lives here as flows, generators that yield the requests they need
+    and receive the responses. The sync and async clients only have to drive
+    those flows with their own httpx client.
+    """
+
+    httpx_client: httpx.Client | httpx.AsyncClient
+    _locale: str
+    _language: str
+    _country: str
+
+    # All the configured locales and their countries, the offers of a title
+    # are queried in all of them at once. The first one is the main locale,
+    # it is used for the searches and the titles.
+    _locales: List[str]
+    _countries: List[str]
+
+    base_url: str = "https://apis.justwatch.com/content"
+    graphql_url: str = "https://apis.justwatch.com/graphql"
+
+    # Batch sizes of the *_many methods, shows have way bigger responses
+    _movie_batch: AdaptiveBatchSize
+    _show_batch: AdaptiveBatchSize
+    _season_batch: AdaptiveBatchSize
+    _search_batch: AdaptiveBatchSize
+
+    _offer_cache: OfferCache | None
+    _metadata_cache: MetadataCache | None
+
+    # Locales and providers shared by all the clients of this process, they
+    # are only requested once per run
+    _shared_metadata: Dict[str, Any] = {}
+
+    retry_policy: RetryPolicy
+    retry_stats: RetryStats
+
+    # Send the sha256 hash of the GraphQL documents instead of the documents
+    # themselves, disabled when JustWatch doesn't support it
+    persisted_queries: bool = True
+
+    rate_limiter: RateLimiter
+
+    def __init__(
+        self,
+        offer_cache: OfferCache | None = None,
+        retry_policy: RetryPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        metadata_cache: MetadataCache | None = None,
+    ):
+        self._offer_cache = offer_cache
+        self._metadata_cache = metadata_cache
+
+        # Set by _set_locale once the locale is resolved
+        self._locale = ""
+        self._language = ""
+        self._country = ""
+        self._locales = []
+        self._countries = []
+
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.retry_stats = RetryStats()
+
+        self.rate_limiter = rate_limiter or RateLimiter()
+
+        self._search_batch = AdaptiveBatchSize(initial=25, maximum=50)
+        self._movie_batch = AdaptiveBatchSize(initial=25, maximum=100)
+        self._show_batch = AdaptiveBatchSize(initial=10, maximum=50)
+        self._season_batch = AdaptiveBatchSize(initial=5, maximum=50)
+
+    def _build_url(self, path: str):
+        return "{}{}".format(self.base_url, path)
+
+    @property
+    def countries(self) -> List[str]:
+        if not self._countries:
+            raise RuntimeError(
+                "The locale of the JustWatch client is not resolved yet"
+            )
+
+        return self._countries
+
+    def _set_locale(self, locale: str, extra_locales: List[str] = []):
+        self._locale = locale
+        [self._language, self._country] = self._locale.split("_")
+
+        self._locales = list(dict.fromkeys([locale, *extra_locales]))
+        self._countries = list(
+            dict.fromkeys([locale.split("_")[1] for locale in self._locales])
+        )
+
+    def _filter_api_error(self, data: httpx.Response):
+
+        if data.status_code == 400:
+            raise JustWatchBadRequest(data.text)
+        if data.status_code == 403:
+            raise JustWatchForbidden()
+        elif data.status_code == 404:
+            raise JustWatchNotFound()
+        elif data.status_code == 429:
+            raise JustWatchTooManyRequests(data)
+        elif data.status_code >= 500:
+            raise JustWatchServerError(data)
+
+        try:
+            j = loads(data.content)
+        except DecodeError:
+            raise JustWatchBadJSON(data.text)
+
+        # The rpc always returns 200 if it is available, the errors in the
+        # payload decide if the request should be retried
+        if "errors" in j:
+            raise JustWatchGraphqlError(data, j["errors"], j.get("data"))
+
+        return j
+
+    def _exchange_flow(self, request: httpx.Request) -> Flow[Tuple[Any, int]]:
+        """
+        Send the request, retrying it according to the retry policy. Returns
+        the decoded response and the size of its body.
+        """
+        attempt = 0
+
+        while True:
+            try:
+                response = yield request
+
+                return (
+                    self._filter_api_error(response),
+                    len(response.content),
+                )
+            except Exception as e:
+                reason = self.retry_policy.reason(e)
+
+                if reason is None:
+                    raise
+                if attempt >= self.retry_policy.total:
+                    self.retry_stats.gave_up += 1
+                    raise
+
+                self.retry_stats.record(reason)
+                yield Sleep(self.retry_policy.delay(attempt, e))
+                attempt += 1
+
+    def _request_flow(
+        self,
+        method: str,
+        path: str,
+        json: Any | None = None,
+        params: httpx.QueryParams | None = None,
+    ) -> Flow[Any]:
+        # JustWatch returns a 403 without a reasonable User-Agent
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36"  # noqa: E501
+        }
+        url = self._build_url(path)
+
+        request = self.httpx_client.build_request(
+            method, url, headers=headers, json=json, params=params
+        )
+
+        (result, _) = yield from self._exchange_flow(request)
+
+        return result
+
+    def _graphql_sized_flow(
+        self, body: Dict[str, Any]
+    ) -> Flow[Tuple[Any, int]]:
+        result, size = yield from self._persisted_graphql_flow(body)
+
+        if len(self._countries) > 1:
+            self._merge_country_offers(result)
+
+        return (result, size)
+
+    def _batch_graphql_flow(
+        self, body: Dict[str, Any]
+    ) -> Flow[Tuple[Any, int, Set[str]]]:
+        """
+        Send a document of aliased queries. When only some of the aliases
+        failed, the response still has the data of the others. Returns the
+        response, the size of its body and the aliases that failed.
+        """
+        try:
+            result, size = yield from self._persisted_graphql_flow(body)
+            failed: Set[str] = set()
+        except JustWatchGraphqlError as e:
+            paths = [error.get("path") for error in e.errors]
+
+            # An error without a path is an error of the whole document
+            if not e.data or not all(paths):
+                raise
+
+            result = {"data": e.data}
+            size = len(e.response.content)
+            failed = {str(path[0]) for path in paths}
+
+        if len(self._countries) > 1:
+            self._merge_country_offers(result)
+
+        return (result, size, failed)
+
+    def _persisted_graphql_flow(
+        self, body: Dict[str, Any]
+    ) -> Flow[Tuple[Any, int]]:
+
+        from .queries import query_hash
+
+        if self.persisted_queries:
+            # Send the hash of the document first, JustWatch only needs the
+            # document itself if it doesn't know the hash yet
+            body = {
+                **body,
+                "extensions": {
+                    "persistedQuery": {
+                        "version": 1,
+                        "sha256Hash": query_hash(body["query"]),
+                    }
+                },
+            }
+            persisted = {k: v for k, v in body.items() if k != "query"}
+
+            try:
+                return (
+                    yield from self._exchange_flow(
+                        self._graphql_request(persisted)
+                    )
+                )
+            except (JustWatchGraphqlError, JustWatchBadRequest) as e:
+                if not self._persisted_query_missing(e):
+                    raise
+
+            if not self.persisted_queries:
+                del body["extensions"]
+
+        return (yield from self._exchange_flow(self._graphql_request(body)))
+
+    def _graphql_request(self, body: Dict[str, Any]) -> httpx.Request:
+        return self.httpx_client.build_request(
+            "post", self.graphql_url, json=body
+        )
+
+    def _coalesce_key(self, request: httpx.Request) -> Hashable | None:
+        """
+        Key of the concurrent requests that can share a single response. The
+        GraphQL requests are keyed by the operation, the hash of the document,
+        the variables and whether the document itself is sent. A persisted
+        request can be answered with PersistedQueryNotFound, so it never
+        shares a response with the full version of the same query.
+        """
+        if request.method == "GET":
+            return ("GET", str(request.url))
+
+        if str(request.url) != self.graphql_url:
+            return None
+
+        from .queries import query_hash
+
+        try:
+            body = loads(request.content)
+        except DecodeError:
+            return None
+
+        if "query" in body:
+            document = query_hash(body["query"])
+        else:
+            document = body["extensions"]["persistedQuery"]["sha256Hash"]
+
+        variables = dumps(body.get("variables"), sort_keys=True)
+
+        return (
+            body.get("operationName"),
+            document,
+            variables,
+            "query" in body,
+        )
+
+    def _persisted_query_missing(self, error: Exception) -> bool:
+        """
+        Check if a persisted query failed because the full document has to be
+        sent. Persisted queries are disabled if JustWatch doesn't support
+        them, any other error is raised as is.
+        """
+        if isinstance(error, JustWatchGraphqlError):
+            text = str(error.errors)
+        else:
+            text = str(error)
+
+        if "PersistedQueryNotFound" in text:
+            return True
+        if "PERSISTED_QUERY_NOT_FOUND" in text:
+            return True
+
+        if (
+            "PersistedQueryNotSupported" in text
+            or "PERSISTED_QUERY_NOT_SUPPORTED" in text
+        ):
+            self.persisted_queries = False
+            return True
+
+        return False
+
+    def _graphql_flow(self, body: Dict[str, Any]) -> Flow[Any]:
+        result, _ = yield from self._graphql_sized_flow(body)
+
+        return result
+
+    def _full_locale_flow(self, locale: str) -> Flow[str]:
+        default_locale = "en_US"
+        path = "/locales/state"
+
+        jw_locales = yield from self._metadata_flow(path)
+
+        valid_locale = any(
+            [True for i in jw_locales if i["full_locale"] == locale]
+        )
+
+        # Check if the locale is a iso_3166_2 Country Code
+        if not valid_locale:
+            locale = "".join(
+                [
+                    i["full_locale"]
+                    for i in jw_locales
+                    if i["iso_3166_2"] == locale
+                ]
+            )
+
+        # If the locale is empty return the default locale
+        if not locale:
+            return default_locale
+
+        return locale
+
+    def _providers_flow(self) -> Flow[Any]:
+        providers = []
+        provider_ids = set()
+
+        # A provider can be available in more than one of the locales
+        for locale in self._locales:
+            path = f"/providers/locale/{locale}"
+
+            for provider in (yield from self._metadata_flow(path)):
+                if provider["id"] not in provider_ids:
+                    provider_ids.add(provider["id"])
+                    providers.append(provider)
+
+        return providers
+
+    def _metadata_flow(self, path: str) -> Flow[Any]:
+        key = self._build_url(path)
+
+        if key in self._shared_metadata:
+            return self._shared_metadata[key]
+
+        value = None
+        if self._metadata_cache is not None:
+            value = self._metadata_cache.get(key)
+
+        if value is None:
+            value = yield from self._request_flow("get", path)
+
+            if self._metadata_cache is not None:
+                self._metadata_cache.set(key, value)
+
+        self._shared_metadata[key] = value
+
+        return value
+
+    def _search_filter(
+        self,
+        title,
+        objectType: str,
+        year: Year | None = None,
+        extra: Dict[str, Any] | None = None,
+    ) -> Dict[str, Any]:
+        filter: Dict[str, Any] = dict(extra or {})
+
+        filter["searchQuery"] = title
+        filter["objectTypes"] = [objectType]
+        if year is not None:
+            (min_year, max_year) = (
+                year if isinstance(year, tuple) else (year, year)
+            )
+            filter["releaseYear"] = {
+                "min": min_year,
+                "max": max_year,
+            }
+
+        return filter
+
+    def _parse_search(self, popular_titles: Any) -> list[SearchResult]:
+        ret = []
+        for node in popular_titles["edges"]:
+            ret.append(SearchResult(node["node"]))
+
+        return ret
+
+    def _search_flow(
+        self,
+        title,
+        objectType: str,
+        results: int = 1,
+        year: Year | None = None,
+        extra: Dict[str, Any] | None = None,
+    ) -> Flow[list[SearchResult]]:
+
+        from .queries import SEARCH_QUERY as query
+
+        request = {
+            "operationName": "GetSearchTitles",
+            "query": query,
+            "variables": {
+                "first": results,
+                "searchTitlesFilter": self._search_filter(
+                    title, objectType, year, extra
+                ),
+                "language": self._language,
+                "country": self._country,
+            },
+        }
+
+        filtered = yield from self._graphql_flow(request)
+
+        return self._parse_search(filtered["data"]["popularTitles"])
+
+    def _search_movie_offers_flow(
+        self,
+        title,
+        results: int = 1,
+        year: Year | None = None,
+        extra: Dict[str, Any] | None = None,
+        providers: List[str] = [],
+        forceFlatrate: bool = False,
+        lean: bool = False,
+    ) -> Flow[list[Tuple[SearchResult, MovieOffers]]]:
+
+        from .queries import SEARCH_OFFERS_QUERY as query
+
+        request = {
+            "operationName": "GetSearchTitlesWithOffers",
+            "query": self._offer_query(query, lean),
+            "variables": {
+                "first": results,
+                "searchTitlesFilter": self._search_filter(
+                    title, "MOVIE", year, extra
+                ),
+                **self._offer_variables(providers, forceFlatrate),
+            },
+        }
+
+        filtered = yield from self._graphql_flow(request)
+
+        ret = []
+        for edge in filtered["data"]["popularTitles"]["edges"]:
+            node = edge["node"]
+            offers = self._parse_movie_offers(node)
+
+            # Store the offers so the next run can skip the search when the
+            # movie is in the resolution index
+            if self._offer_cache is not None:
+                self._offer_cache.set(
+                    self._offer_cache_key(
+                        "movie", node["id"], providers, forceFlatrate, lean
+                    ),
+                    {"id": node["id"], "offers": node["offers"]},
+                    self._offer_cache.movie_ttl,
+                )
+
+            ret.append((SearchResult(node), offers))
+
+        return ret
+
+    def _search_batch_flow(
+        self,
+        searches: List[SearchQuery],
+        results: int,
+        extra: Dict[str, Any] | None = None,
+    ) -> Flow[Tuple[List[Any], int]]:
+
+        from .queries import build_search_batch_query
+
+        variables: Dict[str, Any] = {
+            f"searchTitlesFilter{i}": self._search_filter(*search, extra)
+            for i, search in enumerate(searches)
+        }
+        variables.update(
+            {
+                "first": results,
+                "language": self._language,
+                "country": self._country,
+            }
+        )
+
+        request: Any = {
+            "operationName": "GetSearchTitlesBatch",
+            "query": build_search_batch_query(len(searches)),
+            "variables": variables,
+        }
+
+        result_json, size, failed = yield from self._batch_graphql_flow(
+            request
+        )
+
+        # The searches that failed have no result
+        nodes = [
+            result_json["data"].get(alias) if alias not in failed else None
+            for alias in [f"s{i}" for i in range(len(searches))]
+        ]
+
+        return (nodes, size)
+
+    def _search_many_flow(
+        self,
+        searches: List[SearchQuery],
+        results: int = 4,
+        extra: Dict[str, Any] | None = None,
+    ) -> Flow[List[list[SearchResult] | None]]:
+        searches = [
+            (title, objectType, year) for (title, objectType, year) in searches
+        ]
+
+        found = yield from self._many_flow(
+            searches,
+            self._search_batch,
+            lambda batch: self._search_batch_flow(batch, results, extra),
+            lambda _, node: self._parse_search(node),
+        )
+
+        return [found[search] for search in searches]
+
+    def _offer_filter(
+        self, providers: List[str] = [], forceFlatrate: bool = False
+    ) -> Dict[str, Any]:
+        # MONETIZATION_TYPES = ["FLATRATE", "RENT", "BUY", "ADS", "FREE"]
+        # PRESENTATION_TYPES = ["SD", "HD", "_4K"]
+
+        # TODO: check if there is a way to bypass language checks because atm
+        #       ie. you set "en_IT" you will only find movies that are
+        #       distributed in italy in english.
+        #       if we find a way to bypass this we could apply some kind of
+        #       multi language filter based on the config
+        filter: Dict[str, Any] = {}
+
+        filter["bestOnly"] = True
+
+        if forceFlatrate:
+            filter["monetizationTypes"] = ["FLATRATE"]
+        if len(providers) > 0:
+            filter["packages"] = providers
+
+        return filter
+
+    def _offer_variables(
+        self, providers: List[str] = [], forceFlatrate: bool = False
+    ) -> Dict[str, Any]:
+        variables = {
+            "language": self._language,
+            "country": self._country,
+            "offerFilter": self._offer_filter(providers, forceFlatrate),
+        }
+
+        if len(self._countries) > 1:
+            variables.update(
+                {
+                    f"country{i}": country
+                    for i, country in enumerate(self._countries)
+                }
+            )
+
+        return variables
+
+    def _offer_query(self, query: str, lean: bool) -> str:
+
+        from .queries import build_lean_query, build_multi_country_query
+
+        if lean:
+            query = build_lean_query(query)
+
+        if len(self._countries) > 1:
+            query = build_multi_country_query(query, len(self._countries))
+
+        return query
+
+    def _merge_country_offers(self, node: Any):
+        """
+        Merge the offers of all the countries of a multi country response
+        into the offers field, so it can be parsed like a single country one.
+        """
+        if isinstance(node, list):
+            for item in node:
+                self._merge_country_offers(item)
+            return
+
+        if not isinstance(node, dict):
+            return
+
+        aliases = [f"offers{i}" for i in range(len(self._countries))]
+        if aliases[0] in node:
+            node["offers"] = [
+                offer
+                for alias in aliases
+                for offer in (node.pop(alias, None) or [])
+            ]
+
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                self._merge_country_offers(value)
+
+    def _offers_flow(
+        self,
+        jwid: str,
+        providers: List[str] = [],
+        forceFlatrate: bool = False,
+        lean: bool = False,
+    ) -> Flow[Any]:
+
+        from .queries import OFFER_QUERY as query
+
+        request: Any = {
+            "operationName": "GetTitleOffers",
+            "query": self._offer_query(query, lean),
+            "variables": {
+                "nodeId": jwid,
+                **self._offer_variables(providers, forceFlatrate),
+            },
+        }
+
+        return (yield from self._graphql_flow(request))
+
+    def _node_batch_flow(
+        self,
+        operation: str,
+        query: str,
+        ids: List[str],
+        providers: List[str],
+        forceFlatrate: bool,
+        lean: bool,
+    ) -> Flow[Tuple[List[Any], int]]:
+        variables: Dict[str, Any] = {
+            f"nodeId{i}": id for i, id in enumerate(ids)
+        }
+        variables.update(self._offer_variables(providers, forceFlatrate))
+
+        request: Any = {
+            "operationName": operation,
+            "query": self._offer_query(query, lean),
+            "variables": variables,
+        }
+
+        result_json, size, failed = yield from self._batch_graphql_flow(
+            request
+        )
+
+        # The nodes that failed have no result
+        nodes = [
+            result_json["data"].get(alias) if alias not in failed else None
+            for alias in [f"n{i}" for i in range(len(ids))]
+        ]
+
+        return (nodes, size)
+
+    def _offers_batch_flow(
+        self,
+        jwids: List[str],
+        providers: List[str],
+        forceFlatrate: bool,
+        lean: bool,
+    ) -> Flow[Tuple[List[Any], int]]:
+
+        from .queries import build_offer_batch_query
+
+        return (
+            yield from self._node_batch_flow(
+                "GetTitleOffersBatch",
+                build_offer_batch_query(len(jwids)),
+                jwids,
+                providers,
+                forceFlatrate,
+                lean,
+            )
+        )
+
+    def _show_seasons_flow(
+        self, jwid: str, providers: List[str], forceFlatrate: bool, lean: bool
+    ) -> Flow[Any]:
+
+        from .queries import SHOW_SEASON_QUERY as query
+
+        request: Any = {
+            "operationName": "GetShowSeasonOffers",
+            "query": self._offer_query(query, lean),
+            "variables": {
+                "nodeId": jwid,
+                **self._offer_variables(providers, forceFlatrate),
+            },
+        }
+
+        result_json = yield from self._graphql_flow(request)
+
+        return result_json["data"]["node"]
+
+    def _show_seasons_batch_flow(
+        self,
+        jwids: List[str],
+        providers: List[str],
+        forceFlatrate: bool,
+        lean: bool,
+    ) -> Flow[Tuple[List[Any], int]]:
+
+        from .queries import build_show_season_batch_query
+
+        return (
+            yield from self._node_batch_flow(
+                "GetShowSeasonOffersBatch",
+                build_show_season_batch_query(len(jwids)),
+                jwids,
+                providers,
+                forceFlatrate,
+                lean,
+            )
+        )
+
+    def _season_episodes_batch_flow(
+        self,
+        season_ids: List[str],
+        providers: List[str],
+        forceFlatrate: bool,
+        lean: bool,
+    ) -> Flow[Tuple[List[Any], int]]:
+
+        from .queries import build_season_episodes_batch_query
+
+        return (
+            yield from self._node_batch_flow(
+                "GetSeasonEpisodeOffersBatch",
+                build_season_episodes_batch_query(len(season_ids)),
+                season_ids,
+                providers,
+                forceFlatrate,
+                lean,
+            )
+        )
+
+    def _is_partial_season(self, season: Any) -> bool:
+        # An offer of a fully available season covers all its episodes, in
+        # any other case the offers of every episode are needed
+        total = season["totalEpisodeCount"]
+
+        return any(
+            [
+                (offer.get("elementCount") or 0) < total
+                for offer in season["offers"]
+            ]
+        )
+
+    def _expand_shows_flow(
+        self,
+        nodes: List[Any],
+        providers: List[str],
+        forceFlatrate: bool,
+        lean: bool,
+    ) -> Flow[List[Any | None]]:
+        """
+        Second phase of the show lookup, turns the season level show nodes
+        into show nodes with the offers of every episode. Only the episodes
+        of partially available seasons are queried, the episodes of the
+        other seasons get the offers of their season. A show is None if the
+        episodes of one of its seasons could not be queried.
+        """
+        partial = [
+            season["id"]
+            for node in nodes
+            if node is not None
+            for season in node["seasons"]
+            if self._is_partial_season(season)
+        ]
+
+        season_episodes = yield from self._many_flow(
+            partial,
+            self._season_batch,
+            lambda batch: self._season_episodes_batch_flow(
+                batch, providers, forceFlatrate, lean
+            ),
+            lambda _, node: node["episodes"],
+        )
+
+        result: List[Any | None] = []
+        for node in nodes:
+            if node is None:
+                result.append(None)
+                continue
+
+            seasons = []
+            for season in node["seasons"]:
+                if season["id"] in season_episodes:
+                    episodes = season_episodes[season["id"]]
+                else:
+                    episodes = [
+                        {
+                            "content": episode["content"],
+                            "offers": season["offers"],
+                        }
+                        for episode in season["episodes"]
+                    ]
+
+                seasons.append(
+                    {"content": season["content"], "episodes": episodes}
+                )
+
+            if any([season["episodes"] is None for season in seasons]):
+                result.append(None)
+            else:
+                result.append({"id": node["id"], "seasons": seasons})
+
+        return result
+
+    def _show_node_flow(
+        self, jwid: str, providers: List[str], forceFlatrate: bool, lean: bool
+    ) -> Flow[Any]:
+        node = yield from self._show_seasons_flow(
+            jwid, providers, forceFlatrate, lean
+        )
+
+        [expanded] = yield from self._expand_shows_flow(
+            [node], providers, forceFlatrate, lean
+        )
+        if expanded is None:
+            raise JustWatchIncompleteResponse(jwid)
+
+        return expanded
+
+    def _many_flow(
+        self,
+        items: List[K],
+        batch: AdaptiveBatchSize,
+        batch_flow: Callable[[List[K]], Flow[Tuple[List[Any], int]]],
+        parse: Callable[[K, Any], T],
+    ) -> Flow[Dict[K, T | None]]:
+        result: Dict[K, T | None] = {}
+
+        # Remove duplicates but keep the order of the items
+        pending = list(dict.fromkeys(items))
+
+        while pending:
+            items_batch = pending[: batch.size]
+
+            try:
+                nodes, size = yield from batch_flow(items_batch)
+            except Exception as e:
+                # Throttling, server and connection errors were already
+                # retried, smaller batches would only add more requests
+                if self.retry_policy.reason(e) is not None or isinstance(
+                    e, JustWatchForbidden
+                ):
+                    raise
+
+                # A single item that fails has no result, otherwise try
+                # again with smaller batches to isolate the failing item
+                if len(items_batch) == 1:
+                    result[items_batch[0]] = None
+                    pending = pending[1:]
+                else:
+                    batch.shrink(len(items_batch))
+                continue
+
+            batch.observe(len(items_batch), size)
+
+            for item, node in zip(items_batch, nodes):
+                try:
+                    result[item] = parse(item, node)
+                except Exception:
+                    result[item] = None
+
+            del pending[: len(items_batch)]
+
+        return result
+
+    def _parse_movie_offers(self, node: Any) -> MovieOffers:
+        result: MovieOffers = []
+
+        for offer in node["offers"]:
+            result.append(Offer(offer))
+
+        return result
+
+    def _parse_show_offers(self, node: Any) -> ShowOffers:
+        result: ShowOffers = {}
+
+        for season in node["seasons"]:
+            season_n = season["content"]["seasonNumber"]
+            result[season_n] = {}
+
+            for episode in season["episodes"]:
+                episode_n = episode["content"]["episodeNumber"]
+                result[season_n][episode_n] = []
+
+                for offer in episode["offers"]:
+                    result[season_n][episode_n].append(Offer(offer))
+
+        return result
+
+    def _paged_show_seasons_flow(
+        self, jwid: str, providers: List[str], forceFlatrate: bool, lean: bool
+    ) -> Flow[List[Any]]:
+        node = yield from self._show_seasons_flow(
+            jwid, providers, forceFlatrate, lean
+        )
+        if node is None:
+            raise JustWatchNotFound(jwid)
+
+        return node["seasons"]
+
+    def _season_episodes_page_flow(
+        self,
+        season_id: str,
+        offset: int,
+        limit: int,
+        providers: List[str],
+        forceFlatrate: bool,
+        lean: bool,
+    ) -> Flow[List[Any]]:
+
+        from .queries import SEASON_EPISODES_PAGE_QUERY as query
+
+        request: Any = {
+            "operationName": "GetSeasonEpisodesPage",
+            "query": self._offer_query(query, lean),
+            "variables": {
+                "nodeId": season_id,
+                "limit": limit,
+                "offset": offset,
+                **self._offer_variables(providers, forceFlatrate),
+            },
+        }
+
+        result_json = yield from self._graphql_flow(request)
+
+        return result_json["data"]["node"]["episodes"]
+
+    def _season_episodes(self, season: Any) -> List[Any]:
+        # The episodes of a season that is fully available or not available
+        # at all have the offers of the season
+        return [
+            {"content": episode["content"], "offers": season["offers"]}
+            for episode in season["episodes"]
+        ]
+
+    def _parse_episode_page(
+        self, season: Any, episodes: List[Any]
+    ) -> List[EpisodeOffers]:
+        season_n = season["content"]["seasonNumber"]
+
+        return [
+            (
+                season_n,
+                episode["content"]["episodeNumber"],
+                [Offer(offer) for offer in episode["offers"]],
+            )
+            for episode in episodes
+        ]
+
+    def _store_show_offers(
+        self,
+        jwid: str,
+        providers: List[str],
+        forceFlatrate: bool,
+        lean: bool,
+        seasons: List[Any],
+    ):
+        """
+        Store the seasons of a show that was fetched a page at a time, in the
+        same form as the show nodes of the other lookups.
+        """
+        if self._offer_cache is None:
+            return
+
+        self._offer_cache.set(
+            self._offer_cache_key(
+                "show", jwid, providers, forceFlatrate, lean
+            ),
+            {"id": jwid, "seasons": seasons},
+            self._offer_cache.show_ttl,
+        )
+
+    def _cached_show_offers(
+        self, jwid: str, providers: List[str], forceFlatrate: bool, lean: bool
+    ) -> ShowOffers | None:
+        if self._offer_cache is None:
+            return None
+
+        node = self._offer_cache.get(
+            self._offer_cache_key("show", jwid, providers, forceFlatrate, lean)
+        )
+
+        return self._parse_show_offers(node) if node is not None else None
+
+    def _offer_cache_key(
+        self,
+        kind: str,
+        jwid: str,
+        providers: List[str],
+        forceFlatrate: bool,
+        lean: bool,
+    ) -> str:
+        return OfferCache.key(
+            kind if not lean else f"{kind}-lean",
+            jwid,
+            "+".join(self._locales),
+            self._offer_filter(providers, forceFlatrate),
+        )
+
+    def _cached_offers_flow(
+        self,
+        kind: str,
+        jwid: str,
+        providers: List[str],
+        forceFlatrate: bool,
+        lean: bool,
+        parse: Callable[[Any], T],
+        ttl: float,
+    ) -> Flow[T]:
+        cache = self._offer_cache
+        key = self._offer_cache_key(kind, jwid, providers, forceFlatrate, lean)
+
+        if cache is not None:
+            node = cache.get(key)
+            if node is not None:
+                return parse(node)
+
+        if kind == "show":
+            node = yield from self._show_node_flow(
+                jwid, providers, forceFlatrate, lean
+            )
+        else:
+            result_json = yield from self._offers_flow(
+                jwid, providers, forceFlatrate, lean
+            )
+            node = result_json["data"]["node"]
+
+        result = parse(node)
+
+        if cache is not None:
+            cache.set(key, node, ttl)
+
+        return result
+
+    def _cached_offers_many_flow(
+        self,
+        kind: str,
+        jwids: List[str],
+        providers: List[str],
+        forceFlatrate: bool,
+        lean: bool,
+        parse: Callable[[Any], T],
+        ttl: float,
+        batch: AdaptiveBatchSize,
+    ) -> Flow[Dict[str, T | None]]:
+        cache = self._offer_cache
+        result: Dict[str, T | None] = {}
+
+        keys = {
+            jwid: self._offer_cache_key(
+                kind, jwid, providers, forceFlatrate, lean
+            )
+            for jwid in jwids
+        }
+
+        # Only query the titles that are not in the cache
+        missing = []
+        for jwid, key in keys.items():
+            node = cache.get(key) if cache is not None else None
+
+            if node is not None:
+                result[jwid] = parse(node)
+            else:
+                missing.append(jwid)
+
+        if kind == "show":
+            batch_flow = self._show_seasons_batch_flow
+        else:
+            batch_flow = self._offers_batch_flow
+
+        fetched = yield from self._many_flow(
+            missing,
+            batch,
+            lambda batch: batch_flow(batch, providers, forceFlatrate, lean),
+            lambda _, node: node,
+        )
+
+        if kind == "show":
+            expanded = yield from self._expand_shows_flow(
+                [fetched[jwid] for jwid in missing],
+                providers,
+                forceFlatrate,
+                lean,
+            )
+            fetched = dict(zip(missing, expanded))
+
+        for jwid in missing:
+            node = fetched[jwid]
+
+            try:
+                result[jwid] = parse(node)
+            except Exception:
+                result[jwid] = None
+                continue
+
+            if cache is not None:
+                cache.set(keys[jwid], node, ttl)
+
+        return result
+
+    def _movie_offers_flow(
+        self,
+        jwid: str,
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> Flow[MovieOffers]:
+        return (
+            yield from self._cached_offers_flow(
+                "movie",
+                jwid,
+                providers,
+                forceFlatrate,
+                lean,
+                self._parse_movie_offers,
+                self._offer_cache.movie_ttl if self._offer_cache else 0,
+            )
+        )
+
+    def _show_offers_flow(
+        self,
+        jwid: str,
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> Flow[ShowOffers]:
+        return (
+            yield from self._cached_offers_flow(
+                "show",
+                jwid,
+                providers,
+                forceFlatrate,
+                lean,
+                self._parse_show_offers,
+                self._offer_cache.show_ttl if self._offer_cache else 0,
+            )
+        )
+
+    def _movie_offers_many_flow(
+        self,
+        jwids: List[str],
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> Flow[Dict[str, MovieOffers | None]]:
+        return (
+            yield from self._cached_offers_many_flow(
+                "movie",
+                jwids,
+                providers,
+                forceFlatrate,
+                lean,
+                self._parse_movie_offers,
+                self._offer_cache.movie_ttl if self._offer_cache else 0,
+                self._movie_batch,
+            )
+        )
+
+    def _show_offers_many_flow(
+        self,
+        jwids: List[str],
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> Flow[Dict[str, ShowOffers | None]]:
+        return (
+            yield from self._cached_offers_many_flow(
+                "show",
+                jwids,
+                providers,
+                forceFlatrate,
+                lean,
+                self._parse_show_offers,
+                self._offer_cache.show_ttl if self._offer_cache else 0,
+                self._show_batch,
+            )
+        )
@@ -0,0 +1,40 @@
+class AdaptiveBatchSize:
+    """
+    Keeps track of how many titles fit in a single batched request. After
+    every response the size is recalculated so the next response is around
+    target_bytes, this keeps batches of movies big and batches of long
+    running shows small.
+    """
+
+    size: int
+    minimum: int
+    maximum: int
+    target_bytes: int
+
+    def __init__(
+        self,
+        initial: int,
+        maximum: int,
+        target_bytes: int = 1024 * 1024,
+        minimum: int = 1,
+    ):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_bytes = target_bytes
+
+    def observe(self, items: int, response_bytes: int):
+        if items <= 0:
+            return
+
+        bytes_per_item = max(response_bytes / items, 1)
+        size = int(self.target_bytes / bytes_per_item)
+
+        # Don't grow more than twice at once, one small response should not
+        # make the next batch explode
+        size = min(size, self.size * 2)
+
+        self.size = max(self.minimum, min(self.maximum, size))
+
+    def shrink(self, failed_size: int):
+        self.size = max(self.minimum, failed_size // 2)
@@ -0,0 +1,396 @@
+import json
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import Any, List
+
+from .models import SearchResult
+
+
+class CacheStats:
+    hits: int
+    misses: int
+    stores: int
+    evictions: int
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return f"{self.hits} hits, {self.misses} misses, {self.stores} stores, {self.evictions} evictions"  # noqa: E501
+
+
+class SqliteStore:
+    """
+    Base of the persistent stores, it opens the SQLite database at path and
+    serializes the access to it so the store can be shared between threads.
+    """
+
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class OfferCache(SqliteStore):
+    """
+    Persistent cache of JustWatch offer responses backed by SQLite. Entries
+    are keyed by the JustWatch node ID, locale and offer filter and expire
+    after their TTL. The cache holds at most max_entries entries, the least
+    recently used ones are evicted first.
+    """
+
+    # Run the eviction every this many stores instead of on every store
+    _evict_interval: int = 100
+
+    movie_ttl: float
+    show_ttl: float
+    max_entries: int
+    stats: CacheStats
+
+    def __init__(
+        self,
+        path: str,
+        movie_ttl: float = 24 * 60 * 60,
+        show_ttl: float = 24 * 60 * 60,
+        max_entries: int = 50000,
+    ):
+        super().__init__(path)
+
+        self.movie_ttl = movie_ttl
+        self.show_ttl = show_ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+
+        self._stores_since_evict = 0
+
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS offers (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS offers_accessed_at "
+            "ON offers (accessed_at)"
+        )
+
+        # Remove the stale entries so they don't count against the size
+        self._db.execute(
+            "DELETE FROM offers WHERE expires_at < ?", (time.time(),)
+        )
+
+    def close(self):
+        with self._lock:
+            self._evict()
+        super().close()
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        return "|".join(
+            [
+                (
+                    part
+                    if isinstance(part, str)
+                    else json.dumps(part, sort_keys=True)
+                )
+                for part in parts
+            ]
+        )
+
+    def get(self, key: str) -> Any | None:
+        now = time.time()
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM offers WHERE key = ? AND expires_at >= ?",
+                (key, now),
+            ).fetchone()
+
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            self._db.execute(
+                "UPDATE offers SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.stats.hits += 1
+
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float):
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO offers VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            self.stats.stores += 1
+
+            self._stores_since_evict += 1
+            if self._stores_since_evict >= self._evict_interval:
+                self._evict()
+
+    def _evict(self):
+        self._stores_since_evict = 0
+
+        cursor = self._db.execute(
+            """
+            DELETE FROM offers WHERE key IN (
+                SELECT key FROM offers
+                ORDER BY accessed_at DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+        self.stats.evictions += max(cursor.rowcount, 0)
+
+
+class MetadataCache(SqliteStore):
+    """
+    Persistent cache of the JustWatch responses that hardly ever change, like
+    the available locales and the providers of a locale. Entries expire after
+    ttl seconds.
+    """
+
+    ttl: float
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 60 * 60):
+        super().__init__(path)
+
+        self.ttl = ttl
+
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS metadata (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM metadata WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl),
+            )
+
+
+class ResolutionIndex(SqliteStore):
+    """
+    Permanent index of external IDs (imdb, tmdb or tvdb) to the matching
+    JustWatch title. Once a title is matched it never has to be searched
+    again, the entries don't expire.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS resolutions (
+                object_type TEXT NOT NULL,
+                source TEXT NOT NULL,
+                external_id TEXT NOT NULL,
+                jw_id TEXT NOT NULL,
+                title TEXT,
+                year INTEGER,
+                imdb_id TEXT,
+                tmdb_id INTEGER,
+                PRIMARY KEY (object_type, source, external_id)
+            )
+            """
+        )
+
+    def get(
+        self, object_type: str, source: str, external_id: Any
+    ) -> SearchResult | None:
+        if external_id is None:
+            return None
+
+        with self._lock:
+            row = self._db.execute(
+                """
+                SELECT jw_id, title, year, imdb_id, tmdb_id
+                FROM resolutions
+                WHERE object_type = ? AND source = ? AND external_id = ?
+                """,
+                (object_type, source, str(external_id)),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        (jw_id, title, year, imdb_id, tmdb_id) = row
+
+        return SearchResult(
+            {
+                "id": jw_id,
+                "objectType": object_type,
+                "content": {
+                    "title": title,
+                    "originalReleaseYear": year,
+                    "externalIds": {"imdbId": imdb_id, "tmdbId": tmdb_id},
+                },
+            }
+        )
+
+    def set(
+        self,
+        object_type: str,
+        source: str,
+        external_id: Any,
+        entry: SearchResult,
+    ):
+        if external_id is None:
+            return
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO resolutions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",  # noqa: E501
+                (
+                    object_type,
+                    source,
+                    str(external_id),
+                    entry.id,
+                    entry.title,
+                    entry.year,
+                    entry.imdbId,
+                    entry.tmdbId,
+                ),
+            )
+
+
+class UnmatchedCache(SqliteStore):
+    """
+    Remembers the titles that could not be matched on JustWatch. A title is
+    retried after the first delay of retry_delays, every time it fails again
+    the next (longer) delay is used until the last one is reached.
+    """
+
+    retry_delays: List[float]
+
+    def __init__(
+        self,
+        path: str,
+        retry_delays: List[float] = [
+            24 * 60 * 60,
+            7 * 24 * 60 * 60,
+            30 * 24 * 60 * 60,
+        ],
+    ):
+        super().__init__(path)
+
+        self.retry_delays = retry_delays
+
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS unmatched (
+                object_type TEXT NOT NULL,
+                source TEXT NOT NULL,
+                external_id TEXT NOT NULL,
+                failures INTEGER NOT NULL,
+                retry_at REAL NOT NULL,
+                PRIMARY KEY (object_type, source, external_id)
+            )
+            """
+        )
+
+    def should_skip(
+        self, object_type: str, source: str, external_id: Any
+    ) -> bool:
+        if external_id is None:
+            return False
+
+        with self._lock:
+            row = self._db.execute(
+                """
+                SELECT retry_at FROM unmatched
+                WHERE object_type = ? AND source = ? AND external_id = ?
+                """,
+                (object_type, source, str(external_id)),
+            ).fetchone()
+
+        return row is not None and row[0] > time.time()
+
+    def add_failure(self, object_type: str, source: str, external_id: Any):
+        if external_id is None or not self.retry_delays:
+            return
+
+        key = (object_type, source, str(external_id))
+
+        with self._lock:
+            row = self._db.execute(
+                """
+                SELECT failures FROM unmatched
+                WHERE object_type = ? AND source = ? AND external_id = ?
+                """,
+                key,
+            ).fetchone()
+
+            failures = row[0] + 1 if row is not None else 1
+            delay = self.retry_delays[
+                min(failures, len(self.retry_delays)) - 1
+            ]
+
+            self._db.execute(
+                "INSERT OR REPLACE INTO unmatched VALUES (?, ?, ?, ?, ?)",
+                (*key, failures, time.time() + delay),
+            )
+
+    def remove(self, object_type: str, source: str, external_id: Any):
+        if external_id is None:
+            return
+
+        with self._lock:
+            self._db.execute(
+                """
+                DELETE FROM unmatched
+                WHERE object_type = ? AND source = ? AND external_id = ?
+                """,
+                (object_type, source, str(external_id)),
+            )
@@ -0,0 +1,36 @@
+import json
+
+from typing import Any, Callable, Tuple, Type
+
+# The fastest installed JSON decoder is picked once at import time, orjson and
+# msgspec decode the large offer and library documents several times faster
+# than the standard library.
+
+DecodeError: Tuple[Type[Exception], ...]
+_loads: Callable[[bytes | str], Any]
+
+try:
+    import orjson
+
+    BACKEND = "orjson"
+    DecodeError = (orjson.JSONDecodeError,)
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover
+    try:
+        import msgspec  # type: ignore[import-not-found]
+
+        BACKEND = "msgspec"
+        DecodeError = (msgspec.DecodeError, json.JSONDecodeError)
+        _loads = msgspec.json.decode
+    except ImportError:
+        BACKEND = "json"
+        DecodeError = (json.JSONDecodeError, UnicodeDecodeError)
+        _loads = json.loads
+
+
+def loads(data: bytes | str) -> Any:
+    """
+    Decode a JSON document with the selected backend. Raises one of the
+    exceptions in DecodeError when the document is not valid JSON.
+    """
+    return _loads(data)
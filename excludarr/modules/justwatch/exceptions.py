@@ -1,5 +1,7 @@
 class JustWatchTooManyRequests(Exception):
-    pass
+    def __init__(self, response=None):
+        Exception.__init__(self, response)
+        self.response = response
 
 
 class JustWatchForbidden(Exception):
@@ -18,5 +20,19 @@ class JustWatchBadJSON(Exception):
     pass
 
 
-class JustWatchGraphqlError(Exception):
+class JustWatchIncompleteResponse(Exception):
     pass
+
+
+class JustWatchServerError(Exception):
+    def __init__(self, response):
+        Exception.__init__(self, response)
+        self.response = response
+
+
+class JustWatchGraphqlError(Exception):
+    def __init__(self, response, errors=[], data=None):
+        Exception.__init__(self, response)
+        self.response = response
+        self.errors = errors
+        self.data = data
@@ -1,79 +1,93 @@
-from typing import Any, Dict, List, TypeAlias
-import httpx
-
-from json import JSONDecodeError
+import time
 
-from .exceptions import (
-    JustWatchBadJSON,
-    JustWatchGraphqlError,
-    JustWatchTooManyRequests,
-    JustWatchForbidden,
-    JustWatchNotFound,
-    JustWatchBadRequest,
-)
-from .models import MovieOffers, SearchResult, Offer, ShowOffers
+from typing import Any, Dict, Iterator, List, Tuple
+import httpx
 
-JSON: TypeAlias = (
-    dict[str, "JSON"] | list["JSON"] | str | int | float | bool | None
+from .base import BaseJustWatch, Flow, JSON, SearchQuery, T, Year  # noqa: F401
+from .cache import MetadataCache, OfferCache
+from .models import (
+    EpisodeOffers,
+    MovieOffers,
+    SearchResult,
+    ShowOffers,
+    iter_episode_offers,
 )
+from .ratelimit import ConcurrencyGate, RateLimiter
+from .retry import RetryPolicy, Sleep
+from .singleflight import SingleFlight
 
 
-class JustWatch(object):
+class JustWatch(BaseJustWatch):
     httpx_client: httpx.Client
-    _locale: str
-    _language: str
-    _country: str
-
-    base_url: str = "https://apis.justwatch.com/content"
-    graphql_url: str = "https://apis.justwatch.com/graphql"
-
-    def __init__(self, locale, ssl_verify: bool = True):
-        # TODO: understand how to write this retry strategy with httpx
-        # # Setup retries on failure
-        # retries = Retry(
-        #     total=5,
-        #     backoff_factor=0.5,
-        #     status_forcelist=[429, 500, 502, 503, 504],
-        #     allowed_methods=["GET", "POST"],
-        # )
+
+    def __init__(
+        self,
+        locale: str | List[str],
+        ssl_verify: bool = True,
+        offer_cache: OfferCache | None = None,
+        retry_policy: RetryPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        metadata_cache: MetadataCache | None = None,
+    ):
+        super().__init__(
+            offer_cache, retry_policy, rate_limiter, metadata_cache
+        )
 
         self.httpx_client = httpx.Client(http2=True, verify=ssl_verify)
+        self._gate = ConcurrencyGate(self.rate_limiter)
+        self._single_flight = SingleFlight()
 
-        # Setup locale by verifying its input
-        self._locale = self._get_full_locale(locale)
-        [self._language, self._country] = self._locale.split("_")
+        # Setup locale by verifying its input, the offers are queried in all
+        # the given locales
+        locales = [locale] if isinstance(locale, str) else list(locale)
+        full_locales = [self._get_full_locale(locale) for locale in locales]
+        self._set_locale(full_locales[0], full_locales[1:])
 
     def __exit__(self, *args):
         self.httpx_client.close()
 
-    def _build_url(self, path: str):
-        return "{}{}".format(self.base_url, path)
-
-    def _filter_api_error(self, data: httpx.Response):
-
-        if data.status_code == 400:
-            raise JustWatchBadRequest(data.text)
-        if data.status_code == 403:
-            raise JustWatchForbidden()
-        if data.status_code == 403:
-            raise JustWatchForbidden()
-        elif data.status_code == 404:
-            raise JustWatchNotFound()
-        elif data.status_code == 429:
-            raise JustWatchTooManyRequests()
-
-        try:
-            j = data.json()
-        except JSONDecodeError:
-            raise JustWatchBadJSON(data.text)
-
-        # TODO: write custom retry strategy based on graphql errors
-        #       we can't base out retry strategy on response codes because the
-        #       rpc always returns 200 if it is available, for now this will do
-        if "errors" in j:
-            raise JustWatchGraphqlError(data)
-
-        return j
+    def _run(self, flow: Flow[T]) -> T:
+        response: Any = None
+        error: Exception | None = None
+
+        while True:
+            try:
+                if error is not None:
+                    request = flow.throw(error)
+                else:
+                    request = flow.send(response)
+            except StopIteration as stop:
+                return stop.value
+
+            response, error = None, None
+            if isinstance(request, Sleep):
+                time.sleep(request.seconds)
+                continue
+
+            # Concurrent threads requesting the same thing share a request
+            try:
+                response = self._single_flight.do(
+                    self._coalesce_key(request),
+                    lambda: self._send(request),
+                )
+            except Exception as e:
+                error = e
+
+    def _send(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self.rate_limiter.reserve())
+
+        with self._gate:
+            started = time.monotonic()
+            response = None
+            try:
+                response = self.httpx_client.send(request)
+                return response
+            finally:
+                self.rate_limiter.record(
+                    time.monotonic() - started,
+                    throttled=response is not None
+                    and response.status_code == 429,
+                )
 
     def _http_request(
         self,
@@ -82,19 +96,7 @@ class JustWatch(object):
         json: Any | None = None,
         params: httpx.QueryParams | None = None,
     ):
-        # JustWatch returns a 403 without a reasonable User-Agent
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36"  # noqa: E501
-        }
-        url = self._build_url(path)
-
-        request = self.httpx_client.build_request(
-            method, url, headers=headers, json=json, params=params
-        )
-
-        result = self.httpx_client.send(request)
-
-        return self._filter_api_error(result)
+        return self._run(self._request_flow(method, path, json, params))
 
     def _http_get(self, path: str, params: httpx.QueryParams | None = None):
         return self._http_request("get", path, params=params)
@@ -119,164 +121,228 @@ class JustWatch(object):
         return self._http_request("delete", path, json=json, params=params)
 
     def _get_full_locale(self, locale: str):
-        default_locale = "en_US"
-        path = "/locales/state"
-
-        jw_locales = self._http_get(path)
-
-        valid_locale = any(
-            [True for i in jw_locales if i["full_locale"] == locale]
-        )
-
-        # Check if the locale is a iso_3166_2 Country Code
-        if not valid_locale:
-            locale = "".join(
-                [
-                    i["full_locale"]
-                    for i in jw_locales
-                    if i["iso_3166_2"] == locale
-                ]
-            )
-
-        # If the locale is empty return the default locale
-        if not locale:
-            return default_locale
-
-        return locale
+        return self._run(self._full_locale_flow(locale))
 
     def get_providers(self):
-        path = f"/providers/locale/{self._locale}"
-
-        return self._http_get(path)
+        return self._run(self._providers_flow())
 
     def query_movie_offers(
-        self, jwid: str, providers: List[str] = [], forceFlatrate=False
+        self,
+        jwid: str,
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
     ) -> MovieOffers | None:
+        """
+        Query the offers of a movie. With lean only the package ID of every
+        offer is queried, which is all that is needed to check on which
+        providers a title is.
+        """
 
         try:
-            result_json = self._get_providers(jwid, providers, forceFlatrate)
+            return self._run(
+                self._movie_offers_flow(jwid, providers, forceFlatrate, lean)
+            )
         except Exception:
             return None
 
-        result: MovieOffers = []
-
-        for offer in result_json["data"]["node"]["offers"]:
-            result.append(Offer(offer))
-
-        return result
-
     def query_show_offers(
-        self, jwid: str, providers: List[str] = [], forceFlatrate=False
+        self,
+        jwid: str,
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
     ) -> ShowOffers | None:
 
         try:
-            result_json = self._get_providers(jwid, providers, forceFlatrate)
+            return self._run(
+                self._show_offers_flow(jwid, providers, forceFlatrate, lean)
+            )
         except Exception:
             return None
 
-        result: ShowOffers = {}
+    def iter_show_offers(
+        self,
+        jwid: str,
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+        page_size: int = 100,
+    ) -> Iterator[EpisodeOffers]:
+        """
+        Query the offers of a show a page of episodes at a time. Yields a
+        (season, episode, offers) tuple for every episode as soon as its
+        page is received. Only the episodes of partially available seasons
+        are paged, the other episodes have the offers of their season. The
+        show is stored in the offer cache once all episodes are received.
+        Errors are raised while iterating.
+        """
+        cached = self._cached_show_offers(jwid, providers, forceFlatrate, lean)
+        if cached is not None:
+            yield from iter_episode_offers(cached)
+            return
+
+        seasons = self._run(
+            self._paged_show_seasons_flow(jwid, providers, forceFlatrate, lean)
+        )
 
-        for season in result_json["data"]["node"]["seasons"]:
-            season_n = season["content"]["seasonNumber"]
-            result[season_n] = {}
+        show_seasons = []
+        for season in seasons:
+            if not self._is_partial_season(season):
+                episodes = self._season_episodes(season)
+                yield from self._parse_episode_page(season, episodes)
+            else:
+                episodes = []
+                offset = 0
+                while True:
+                    page = self._run(
+                        self._season_episodes_page_flow(
+                            season["id"],
+                            offset,
+                            page_size,
+                            providers,
+                            forceFlatrate,
+                            lean,
+                        )
+                    )
+                    episodes.extend(page)
+
+                    yield from self._parse_episode_page(season, page)
+
+                    if len(page) < page_size:
+                        break
+                    offset += page_size
+
+            show_seasons.append(
+                {"content": season["content"], "episodes": episodes}
+            )
 
-            for episode in season["episodes"]:
-                episode_n = episode["content"]["episodeNumber"]
-                result[season_n][episode_n] = []
+        self._store_show_offers(
+            jwid, providers, forceFlatrate, lean, show_seasons
+        )
 
-                for offer in episode["offers"]:
-                    result[season_n][episode_n].append(Offer(offer))
+    def query_movie_offers_many(
+        self,
+        jwids: List[str],
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> Dict[str, MovieOffers | None]:
+        """
+        Query the offers of many movies using batched requests. Returns a
+        dict with the offers of every JustWatch ID, None if it failed.
+        Raises when JustWatch keeps throttling or failing the requests.
+        """
+        return self._run(
+            self._movie_offers_many_flow(jwids, providers, forceFlatrate, lean)
+        )
 
-        return result
+    def query_show_offers_many(
+        self,
+        jwids: List[str],
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> Dict[str, ShowOffers | None]:
+        """
+        Query the offers of many shows using batched requests. Returns a
+        dict with the offers of every JustWatch ID, None if it failed.
+        Raises when JustWatch keeps throttling or failing the requests.
+        """
+        return self._run(
+            self._show_offers_many_flow(jwids, providers, forceFlatrate, lean)
+        )
 
     def search_movie(
-        self, title: str, results=4, year: int | None = None
+        self,
+        title: str,
+        results=4,
+        year: Year | None = None,
+        search_filter: Dict[str, Any] | None = None,
     ) -> list[SearchResult] | None:
+        """
+        Search a movie by its title. The search_filter is merged into the
+        popularTitles filter, e.g. packages and monetizationTypes to only
+        return the movies that are streaming on those providers.
+        """
         try:
-            return self._search(title, "MOVIE", results, year)
+            return self._search(title, "MOVIE", results, year, search_filter)
+        except Exception:
+            return None
+
+    def search_movie_offers(
+        self,
+        title: str,
+        results=4,
+        year: Year | None = None,
+        search_filter: Dict[str, Any] | None = None,
+        providers: List[str] = [],
+        forceFlatrate=False,
+        lean=False,
+    ) -> list[Tuple[SearchResult, MovieOffers]] | None:
+        """
+        Search a movie by its title and return the offers of every result
+        along with it, filtered the same way as query_movie_offers.
+        """
+        try:
+            return self._run(
+                self._search_movie_offers_flow(
+                    title,
+                    results,
+                    year,
+                    search_filter,
+                    providers,
+                    forceFlatrate,
+                    lean,
+                )
+            )
         except Exception:
             return None
 
     def search_show(
-        self, title: str, results=4, year: int | None = None
+        self,
+        title: str,
+        results=4,
+        year: Year | None = None,
+        search_filter: Dict[str, Any] | None = None,
     ) -> list[SearchResult] | None:
 
         try:
-            return self._search(title, "SHOW", results, year)
+            return self._search(title, "SHOW", results, year, search_filter)
         except Exception:
             return None
 
+    def search_many(
+        self,
+        searches: List[SearchQuery],
+        results=4,
+        search_filter: Dict[str, Any] | None = None,
+    ) -> List[list[SearchResult] | None]:
+        """
+        Search many titles using batched requests. Every search is a tuple
+        of (title, objectType, year) where objectType is MOVIE or SHOW and
+        year can be None, a year or a (min, max) range of years. The
+        search_filter is merged into the filter of every search. Returns the
+        results in the same order as the searches, None if a search failed.
+        Raises when JustWatch keeps throttling or failing the requests.
+        """
+        return self._run(
+            self._search_many_flow(searches, results, search_filter)
+        )
+
     def _search(
-        self, title, objectType: str, results: int = 1, year: int | None = None
+        self,
+        title,
+        objectType: str,
+        results: int = 1,
+        year: Year | None = None,
+        search_filter: Dict[str, Any] | None = None,
     ) -> list[SearchResult]:
-
-        from .queries import SEARCH_QUERY as query
-
-        filter = {}
-
-        filter["searchQuery"] = title
-        filter["objectTypes"] = [objectType]
-        if year is not None:
-            filter["releaseYear"] = {
-                "min": year,
-                "max": year,
-            }
-
-        request = {
-            "operationName": "GetSearchTitles",
-            "query": query,
-            "variables": {
-                "first": results,
-                "searchTitlesFilter": filter,
-                "language": self._language,
-                "country": self._country,
-            },
-        }
-
-        response = self.httpx_client.post(self.graphql_url, json=request)
-
-        filtered = self._filter_api_error(response)
-
-        ret = []
-        for node in filtered["data"]["popularTitles"]["edges"]:
-            ret.append(SearchResult(node["node"]))
-
-        return ret
+        return self._run(
+            self._search_flow(title, objectType, results, year, search_filter)
+        )
 
     def _get_providers(
         self, jwid: str, providers: List[str] = [], forceFlatrate: bool = False
     ):
-
-        from .queries import OFFER_QUERY as query
-
-        # MONETIZATION_TYPES = ["FLATRATE", "RENT", "BUY", "ADS", "FREE"]
-        # PRESENTATION_TYPES = ["SD", "HD", "_4K"]
-
-        # TODO: check if there is a way to bypass language checks because atm
-        #       ie. you set "en_IT" you will only find movies that are
-        #       distributed in italy in english.
-        #       if we find a way to bypass this we could apply some kind of
-        #       multi language filter based on the config
-        filter: Dict[str, Any] = {}
-
-        filter["bestOnly"] = True
-
-        if forceFlatrate:
-            filter["monetizationTypes"] = ["FLATRATE"]
-        if len(providers) > 0:
-            filter["packages"] = providers
-
-        request: Any = {
-            "operationName": "GetTitleOffers",
-            "query": query,
-            "variables": {
-                "nodeId": jwid,
-                "language": self._language,
-                "country": self._country,
-                "offerFilter": filter,
-            },
-        }
-
-        response = self.httpx_client.post(self.graphql_url, json=request)
-
-        return self._filter_api_error(response)
+        return self._run(self._offers_flow(jwid, providers, forceFlatrate))
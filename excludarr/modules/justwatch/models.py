@@ -1,7 +1,29 @@
-from typing import Dict, List
+import sys
+
+from typing import Dict, Iterator, List, Tuple
+
+# Big shows produce hundreds of thousands of offers that only differ in a
+# handful of providers and languages, these are shared between all offers
+_package_ids: Dict[int, int] = {}
+_languages: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _intern_name(name: str | None) -> str | None:
+    return sys.intern(name) if name is not None else None
+
+
+def _intern_package_id(package_id: int) -> int:
+    return _package_ids.setdefault(package_id, package_id)
+
+
+def _intern_languages(languages: List[str] | None) -> Tuple[str, ...]:
+    key = tuple(languages or ())
+    return _languages.setdefault(key, key)
 
 
 class SearchResult:
+    __slots__ = ("id", "objectType", "title", "year", "imdbId", "tmdbId")
+
     id: str
     objectType: str
     title: str
@@ -14,7 +36,7 @@ class SearchResult:
 
     def __from_json(self, node):
         self.id = node["id"]
-        self.ty = node["objectType"]
+        self.objectType = node["objectType"]
         self.title = node["content"]["title"]
         self.year = node["content"]["originalReleaseYear"]
         self.imdbId = node["content"]["externalIds"]["imdbId"]
@@ -23,14 +45,30 @@ class SearchResult:
 
 
 class Offer:
-    id: str
-    monetizationType: str
-    presentationType: str
-    providerClearName: str
-    providertechnicalName: str
-    providerShortName: str
-    subtitleLanguages: List[str]
-    audioLanguages: List[str]
+    """
+    A single offer of a title. Only the package ID is always set, the other
+    fields are None (or empty) when the offer comes from a lean query.
+    """
+
+    __slots__ = (
+        "id",
+        "monetizationType",
+        "presentationType",
+        "providerClearName",
+        "providertechnicalName",
+        "providerShortName",
+        "subtitleLanguages",
+        "audioLanguages",
+    )
+
+    id: int
+    monetizationType: str | None
+    presentationType: str | None
+    providerClearName: str | None
+    providertechnicalName: str | None
+    providerShortName: str | None
+    subtitleLanguages: Tuple[str, ...]
+    audioLanguages: Tuple[str, ...]
 
     def __init__(self, json):
         self.__from_json(json)
@@ -38,15 +76,18 @@ class Offer:
     def __from_json(self, node):
         assert node["__typename"] == "Offer"
 
-        self.monetizationType = node["monetizationType"]
-        self.presentationType = node["presentationType"]
-        self.subtitleLanguages = node["subtitleLanguages"]
-        self.audioLanguages = node["audioLanguages"]
+        self.monetizationType = _intern_name(node.get("monetizationType"))
+        self.presentationType = _intern_name(node.get("presentationType"))
+        self.subtitleLanguages = _intern_languages(
+            node.get("subtitleLanguages")
+        )
+        self.audioLanguages = _intern_languages(node.get("audioLanguages"))
 
-        self.id = node["package"]["packageId"]
-        self.providerClearName = node["package"]["clearName"]
-        self.providertechnicalName = node["package"]["technicalName"]
-        self.providerShortName = node["package"]["shortName"]
+        package = node["package"]
+        self.id = _intern_package_id(package["packageId"])
+        self.providerClearName = _intern_name(package.get("clearName"))
+        self.providertechnicalName = _intern_name(package.get("technicalName"))
+        self.providerShortName = _intern_name(package.get("shortName"))
 
 
 # flat offers list
@@ -54,3 +95,12 @@ MovieOffers = List[Offer]
 
 # season -> episode -> offers list
 ShowOffers = Dict[int, Dict[int, List[Offer]]]
+
+# season, episode and offers list of a single episode
+EpisodeOffers = Tuple[int, int, List[Offer]]
+
+
+def iter_episode_offers(offers: ShowOffers) -> Iterator[EpisodeOffers]:
+    for season_n, episodes in offers.items():
+        for episode_n, episode_offers in episodes.items():
+            yield (season_n, episode_n, episode_offers)
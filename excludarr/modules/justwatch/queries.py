@@ -1,4 +1,31 @@
-SEARCH_QUERY = """#graphql
+import hashlib
+import re
+
+from functools import lru_cache
+
+SEARCH_FRAGMENTS = """
+fragment SearchTitle on MovieOrShow {
+    id
+    objectId
+    objectType
+    content(country: $country, language: $language) {
+        title
+        originalReleaseYear
+        originalReleaseDate
+        externalIds {
+            imdbId
+            tmdbId
+            __typename
+        }
+        __typename
+    }
+    __typename
+}
+"""
+
+
+SEARCH_QUERY = (
+    """#graphql
 query GetSearchTitles(
     $searchTitlesFilter: TitleFilter!
     $country: Country!
@@ -12,23 +39,7 @@ query GetSearchTitles(
     ) {
         edges {
             node {
-                ... on MovieOrShow {
-                    id
-                    objectId
-                    objectType
-                    content(country: $country, language: $language) {
-                        title
-                        originalReleaseYear
-                        originalReleaseDate
-                        externalIds {
-                            imdbId
-                            tmdbId
-                            __typename
-                        }
-                        __typename
-                    }
-                    __typename
-                }
+                ...SearchTitle
             }
             __typename
         }
@@ -36,22 +47,113 @@ query GetSearchTitles(
     }
 }
 """
+    + SEARCH_FRAGMENTS
+)
 
 
-OFFER_QUERY = """#graphql
-query GetTitleOffers(
-    $nodeId: ID!
+OFFER_FRAGMENT = """
+fragment Offer on Offer {
+    monetizationType
+    presentationType
+    elementCount
+    subtitleLanguages
+    audioLanguages
+    package {
+        id
+        packageId
+        clearName
+        shortName
+        technicalName
+
+        __typename
+    }
+}
+"""
+
+
+# Minimal Offer fragment for the exclude and re-add decisions, those only
+# need to know which packages a title is on
+OFFER_ID_FRAGMENT = """
+fragment Offer on Offer {
+    elementCount
+    package {
+        packageId
+    }
+}
+"""
+
+
+@lru_cache(maxsize=None)
+def build_lean_query(query: str) -> str:
+    """
+    Build the lean variant of an offer document, it selects the same nodes
+    but only the package ID of every offer.
+    """
+    return query.replace(OFFER_FRAGMENT, OFFER_ID_FRAGMENT)
+
+
+# Search query that also returns the offers of every movie it finds, this
+# saves a GetTitleOffers request per movie
+SEARCH_OFFERS_QUERY = (
+    """#graphql
+query GetSearchTitlesWithOffers(
+    $searchTitlesFilter: TitleFilter!
     $country: Country!
-    $offerFilter: OfferFilter!
     $language: Language!
+    $first: Int!
+    $offerFilter: OfferFilter!
 ) {
-    node(id: $nodeId) {
-        ...TitleDetails
+    popularTitles(
+        country: $country
+        filter: $searchTitlesFilter
+        first: $first
+    ) {
+        edges {
+            node {
+                ...SearchTitle
+                ... on Movie {
+                    offers(
+                        country: $country
+                        platform: WEB
+                        filter: $offerFilter
+                    ) {
+                        ...Offer
+                        __typename
+                    }
+                }
+            }
+            __typename
+        }
+        __typename
+    }
+}
+"""
+    + SEARCH_FRAGMENTS
+    + OFFER_FRAGMENT
+)
+
+
+EPISODE_FRAGMENT = (
+    """
+fragment Episode on Episode {
+    id
+    objectId
+    content(country: $country, language: $language) {
+    episodeNumber
+    seasonNumber
+    }
+    offers(country: $country, platform: WEB, filter: $offerFilter) {
+        ...Offer
         __typename
     }
-    __typename
 }
+"""
+    + OFFER_FRAGMENT
+)
 
+
+OFFER_FRAGMENTS = (
+    """
 fragment TitleDetails on Node {
     id
     __typename
@@ -85,34 +187,327 @@ fragment Season on Season {
         __typename
     }
 }
+"""
+    + EPISODE_FRAGMENT
+)
 
-fragment Episode on Episode {
+
+OFFER_QUERY = (
+    """#graphql
+query GetTitleOffers(
+    $nodeId: ID!
+    $country: Country!
+    $offerFilter: OfferFilter!
+    $language: Language!
+) {
+    node(id: $nodeId) {
+        ...TitleDetails
+        __typename
+    }
+    __typename
+}
+"""
+    + OFFER_FRAGMENTS
+)
+
+
+# First phase of a show lookup, only the offers of the seasons are fetched
+# together with the episode numbers. The elementCount of a season offer tells
+# on how many episodes of the season it is available.
+SHOW_SEASON_FRAGMENTS = (
+    """
+fragment ShowSeasons on Node {
     id
-    objectId
+    __typename
+    ... on Show {
+        seasons(sortDirection: ASC) {
+            ...SeasonOffers
+            __typename
+        }
+        __typename
+    }
+}
+
+fragment SeasonOffers on Season {
+    id
+    totalEpisodeCount
     content(country: $country, language: $language) {
-    episodeNumber
-    seasonNumber
+        seasonNumber
     }
     offers(country: $country, platform: WEB, filter: $offerFilter) {
         ...Offer
         __typename
     }
+    episodes {
+        id
+        content(country: $country, language: $language) {
+            episodeNumber
+        }
+    }
 }
+"""
+    + OFFER_FRAGMENT
+)
 
-fragment Offer on Offer {
-    monetizationType
-    presentationType
-    elementCount
-    subtitleLanguages
-    audioLanguages
-    package {
-        id
-        packageId
-        clearName
-        shortName
-        technicalName
 
+SHOW_SEASON_QUERY = (
+    """#graphql
+query GetShowSeasonOffers(
+    $nodeId: ID!
+    $country: Country!
+    $offerFilter: OfferFilter!
+    $language: Language!
+) {
+    node(id: $nodeId) {
+        ...ShowSeasons
         __typename
     }
+    __typename
 }
 """
+    + SHOW_SEASON_FRAGMENTS
+)
+
+
+# Second phase of a show lookup, the episode offers of the seasons that are
+# only partially available
+SEASON_EPISODES_FRAGMENTS = (
+    """
+fragment SeasonEpisodes on Node {
+    id
+    __typename
+    ... on Season {
+        episodes {
+            ...Episode
+            __typename
+        }
+        __typename
+    }
+}
+"""
+    + EPISODE_FRAGMENT
+)
+
+
+# Paginated show lookup, the episodes of the partially available seasons are
+# fetched a page at a time after the first phase of the show lookup.
+SEASON_EPISODES_PAGE_QUERY = (
+    """#graphql
+query GetSeasonEpisodesPage(
+    $nodeId: ID!
+    $limit: Int!
+    $offset: Int!
+    $country: Country!
+    $offerFilter: OfferFilter!
+    $language: Language!
+) {
+    node(id: $nodeId) {
+        id
+        __typename
+        ... on Season {
+            episodes(limit: $limit, offset: $offset) {
+                id
+                content(country: $country, language: $language) {
+                    episodeNumber
+                }
+                offers(
+                    country: $country
+                    platform: WEB
+                    filter: $offerFilter
+                ) {
+                    ...Offer
+                    __typename
+                }
+                __typename
+            }
+            __typename
+        }
+    }
+    __typename
+}
+"""
+    + OFFER_FRAGMENT
+)
+
+
+def _build_node_batch_query(
+    operation: str, size: int, fragment: str, fragments: str
+) -> str:
+    variables = "\n".join([f"    $nodeId{i}: ID!" for i in range(size)])
+    selections = "\n".join(
+        [
+            f"""    n{i}: node(id: $nodeId{i}) {{
+        ...{fragment}
+        __typename
+    }}"""
+            for i in range(size)
+        ]
+    )
+
+    return (
+        f"""#graphql
+query {operation}(
+{variables}
+    $country: Country!
+    $offerFilter: OfferFilter!
+    $language: Language!
+) {{
+{selections}
+    __typename
+}}
+"""
+        + fragments
+    )
+
+
+@lru_cache(maxsize=None)
+def build_offer_batch_query(size: int) -> str:
+    """
+    Build a GetTitleOffers document that fetches the offers of `size` nodes
+    at once. Every node is selected under the alias n0..n{size - 1} and its
+    ID is passed with the variables nodeId0..nodeId{size - 1}.
+    """
+    return _build_node_batch_query(
+        "GetTitleOffersBatch", size, "TitleDetails", OFFER_FRAGMENTS
+    )
+
+
+@lru_cache(maxsize=None)
+def build_show_season_batch_query(size: int) -> str:
+    """
+    Build a GetShowSeasonOffers document for `size` shows at once, the shows
+    are aliased and passed the same way as in build_offer_batch_query.
+    """
+    return _build_node_batch_query(
+        "GetShowSeasonOffersBatch",
+        size,
+        "ShowSeasons",
+        SHOW_SEASON_FRAGMENTS,
+    )
+
+
+@lru_cache(maxsize=None)
+def build_season_episodes_batch_query(size: int) -> str:
+    """
+    Build a document that fetches the episode offers of `size` seasons at
+    once, the seasons are aliased and passed the same way as in
+    build_offer_batch_query.
+    """
+    return _build_node_batch_query(
+        "GetSeasonEpisodeOffersBatch",
+        size,
+        "SeasonEpisodes",
+        SEASON_EPISODES_FRAGMENTS,
+    )
+
+
+@lru_cache(maxsize=None)
+def build_search_batch_query(size: int) -> str:
+    """
+    Build a GetSearchTitles document that runs `size` searches at once. Every
+    search is selected under the alias s0..s{size - 1} and its filter is
+    passed with the variables searchTitlesFilter0..searchTitlesFilter{size - 1}.
+    """  # noqa: E501
+    variables = "\n".join(
+        [f"    $searchTitlesFilter{i}: TitleFilter!" for i in range(size)]
+    )
+    selections = "\n".join(
+        [
+            f"""    s{i}: popularTitles(
+        country: $country
+        filter: $searchTitlesFilter{i}
+        first: $first
+    ) {{
+        edges {{
+            node {{
+                ...SearchTitle
+            }}
+            __typename
+        }}
+        __typename
+    }}"""
+            for i in range(size)
+        ]
+    )
+
+    return (
+        f"""#graphql
+query GetSearchTitlesBatch(
+{variables}
+    $country: Country!
+    $language: Language!
+    $first: Int!
+) {{
+{selections}
+}}
+"""
+        + SEARCH_FRAGMENTS
+    )
+
+
+def _closing(document: str, start: int, open: str, close: str) -> int:
+    """
+    Index right after the bracket that closes the one at `start`.
+    """
+    depth = 0
+    for i in range(start, len(document)):
+        if document[i] == open:
+            depth += 1
+        elif document[i] == close:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+
+    raise ValueError(f"Unbalanced {open}{close} in document")
+
+
+@lru_cache(maxsize=None)
+def build_multi_country_query(query: str, countries: int) -> str:
+    """
+    Build a variant of an offer document that selects the offers of
+    `countries` countries at once. Every offers field is repeated under the
+    aliases offers0..offers{countries - 1} with the country variables
+    country0..country{countries - 1}, the content is still selected in the
+    main country.
+    """
+    parts = []
+    position = 0
+
+    for match in re.finditer(r"\boffers\(", query):
+        arguments_end = _closing(query, match.end() - 1, "(", ")")
+        selection_start = query.index("{", arguments_end)
+        selection_end = _closing(query, selection_start, "{", "}")
+
+        start = match.start()
+        field = query[start:selection_end]
+        indent = query[query.rindex("\n", 0, start) : start]  # noqa: E203
+
+        parts.append(query[position:start])
+        parts.append(
+            indent.join(
+                [
+                    f"offers{i}: " + field.replace("$country", f"$country{i}")
+                    for i in range(countries)
+                ]
+            )
+        )
+        position = selection_end
+
+    parts.append(query[position:])
+
+    variables = "".join(
+        [f"\n    $country{i}: Country!" for i in range(countries)]
+    )
+
+    return "".join(parts).replace(
+        "$country: Country!", "$country: Country!" + variables, 1
+    )
+
+
+@lru_cache(maxsize=None)
+def query_hash(query: str) -> str:
+    """
+    The sha256 hash of a document, it is sent instead of the document when
+    using automatic persisted queries.
+    """
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
@@ -0,0 +1,214 @@
+import asyncio
+import threading
+import time
+
+from collections import deque
+from typing import Deque
+
+
+class RateLimiterStats:
+    requests: int
+    throttled: int
+    latency_spikes: int
+
+    def __init__(self):
+        self.requests = 0
+        self.throttled = 0
+        self.latency_spikes = 0
+
+
+class RateLimiter:
+    """
+    Client side rate limiter of the JustWatch client. A token bucket caps the
+    amount of requests per second, on top of that an AIMD controller decides
+    how many requests can be in flight. The concurrency grows by one every
+    time a full window of requests was healthy and is halved when JustWatch
+    answers with a 429 or when the latency spikes.
+    """
+
+    rate: float
+    burst: float
+    min_concurrency: int
+    max_concurrency: int
+    latency_factor: float
+    stats: RateLimiterStats
+
+    # Amount of requests used to calculate the current request rate
+    _rate_window: int = 50
+    # Smoothing factor of the latency average
+    _latency_alpha: float = 0.1
+    # Amount of requests before a latency spike can be detected
+    _latency_warmup: int = 10
+    # Minimum amount of seconds between two decreases caused by latency
+    # spikes, the average needs some requests to follow a lasting change
+    _spike_interval: float = 5
+
+    def __init__(
+        self,
+        rate: float = 10,
+        burst: float = 10,
+        initial_concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_concurrency: int = 32,
+        latency_factor: float = 4,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_factor = latency_factor
+        self.stats = RateLimiterStats()
+
+        self._lock = threading.Lock()
+
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+
+        self._limit = float(
+            max(min_concurrency, min(initial_concurrency, max_concurrency))
+        )
+        self._latency: float | None = None
+        self._decreased_at = 0.0
+        self._spike_decreased_at = 0.0
+        self._completed: Deque[float] = deque(maxlen=self._rate_window)
+
+    @property
+    def concurrency(self) -> int:
+        return int(self._limit)
+
+    def reserve(self) -> float:
+        """
+        Take a token from the bucket. Returns how many seconds the caller has
+        to wait before sending its request.
+        """
+        if self.rate <= 0:
+            return 0
+
+        with self._lock:
+            now = time.monotonic()
+
+            self._tokens = min(
+                self.burst,
+                self._tokens + (now - self._refilled_at) * self.rate,
+            )
+            self._refilled_at = now
+
+            # The token can be taken in advance, the bucket goes negative and
+            # the caller waits until it would have been refilled
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+
+            return -self._tokens / self.rate
+
+    def record(self, latency: float, throttled: bool = False):
+        """
+        Feed the outcome of a request to the concurrency controller.
+        """
+        with self._lock:
+            now = time.monotonic()
+
+            self.stats.requests += 1
+            self._completed.append(now)
+
+            spike = (
+                self._latency is not None
+                and self.stats.requests > self._latency_warmup
+                and latency > self._latency * self.latency_factor
+            )
+
+            # Requests that were in flight together all report the same
+            # congestion, only decrease once per round trip
+            decrease = now - self._decreased_at > (self._latency or 0)
+
+            if throttled:
+                self.stats.throttled += 1
+            elif spike:
+                self.stats.latency_spikes += 1
+                decrease = (
+                    decrease
+                    and now - self._spike_decreased_at > self._spike_interval
+                )
+                if decrease:
+                    self._spike_decreased_at = now
+
+            if throttled or spike:
+                if decrease:
+                    self._limit = max(self.min_concurrency, self._limit / 2)
+                    self._decreased_at = now
+            else:
+                self._limit = min(
+                    self.max_concurrency, self._limit + 1 / self._limit
+                )
+
+            # The spikes are part of the average as well, otherwise a lasting
+            # change of the latency would be a spike forever
+            self._latency = (
+                latency
+                if self._latency is None
+                else self._latency
+                + self._latency_alpha * (latency - self._latency)
+            )
+
+    def current_rate(self) -> float:
+        """
+        The amount of requests per second over the last requests.
+        """
+        with self._lock:
+            if len(self._completed) < 2:
+                return 0
+
+            elapsed = self._completed[-1] - self._completed[0]
+
+            return (len(self._completed) - 1) / elapsed if elapsed else 0
+
+    def __str__(self):
+        latency = (self._latency or 0) * 1000
+
+        return f"{self.current_rate():.1f} requests/s with concurrency {self.concurrency}, average latency {latency:.0f}ms, {self.stats.requests} requests, {self.stats.throttled} throttled, {self.stats.latency_spikes} latency spikes"  # noqa: E501
+
+
+class ConcurrencyGate:
+    """
+    Blocks threads while the rate limiter's amount of requests is in flight.
+    """
+
+    def __init__(self, limiter: RateLimiter):
+        self._limiter = limiter
+        self._condition = threading.Condition()
+        self._in_flight = 0
+
+    def __enter__(self):
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._in_flight < self._limiter.concurrency
+            )
+            self._in_flight += 1
+
+    def __exit__(self, *args):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+
+class AsyncConcurrencyGate:
+    """
+    Blocks tasks while the rate limiter's amount of requests is in flight.
+    """
+
+    def __init__(self, limiter: RateLimiter):
+        self._limiter = limiter
+        self._condition = asyncio.Condition()
+        self._in_flight = 0
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self._in_flight < self._limiter.concurrency
+            )
+            self._in_flight += 1
+
+    async def __aexit__(self, *args):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
@@ -0,0 +1,143 @@
+import random
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict
+import httpx
+
+from .exceptions import (
+    JustWatchGraphqlError,
+    JustWatchServerError,
+    JustWatchTooManyRequests,
+)
+
+# GraphQL error codes and messages that are worth another try, any other
+# error is caused by the query itself and will fail again
+RETRYABLE_GRAPHQL_CODES = {
+    "INTERNAL_SERVER_ERROR",
+    "SERVICE_UNAVAILABLE",
+    "GATEWAY_TIMEOUT",
+    "TIMEOUT",
+    "TOO_MANY_REQUESTS",
+    "RATE_LIMITED",
+}
+RETRYABLE_GRAPHQL_MESSAGES = (
+    "timeout",
+    "timed out",
+    "too many requests",
+    "rate limit",
+    "temporarily unavailable",
+)
+
+
+class Sleep:
+    """
+    Yielded by a flow instead of a request when it wants to wait before
+    sending the next request.
+    """
+
+    seconds: float
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+
+class RetryStats:
+    retries: int
+    gave_up: int
+    reasons: Dict[str, int]
+
+    def __init__(self):
+        self.retries = 0
+        self.gave_up = 0
+        self.reasons = {}
+
+    def record(self, reason: str):
+        self.retries += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def __str__(self):
+        reasons = ", ".join([f"{k}: {v}" for k, v in self.reasons.items()])
+
+        return f"{self.retries} retries ({reasons or 'none'}), gave up {self.gave_up} times"  # noqa: E501
+
+
+class RetryPolicy:
+    """
+    Decides which failed requests are retried and how long to wait before
+    the next attempt. The delay grows exponentially with full jitter, unless
+    the server tells us how long to wait with a Retry-After header.
+    """
+
+    total: int
+    backoff_factor: float
+    max_backoff: float
+    max_retry_after: float
+
+    def __init__(
+        self,
+        total: int = 5,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30,
+        max_retry_after: float = 300,
+    ):
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+
+    def reason(self, error: Exception) -> str | None:
+        """
+        Returns why the error can be retried, None if it can't be retried.
+        """
+        if isinstance(error, JustWatchTooManyRequests):
+            return "429"
+        if isinstance(error, JustWatchServerError):
+            return str(error.response.status_code)
+        if isinstance(error, httpx.TransportError):
+            return type(error).__name__
+        if isinstance(error, JustWatchGraphqlError):
+            for e in error.errors:
+                code = e.get("extensions", {}).get("code", "")
+                message = e.get("message", "").lower()
+
+                if code in RETRYABLE_GRAPHQL_CODES or any(
+                    [m in message for m in RETRYABLE_GRAPHQL_MESSAGES]
+                ):
+                    return "graphql"
+
+        return None
+
+    def delay(self, attempt: int, error: Exception) -> float:
+        backoff = min(self.max_backoff, self.backoff_factor * 2**attempt)
+        delay = random.uniform(0, backoff)
+
+        response = getattr(error, "response", None)
+        if isinstance(response, httpx.Response):
+            retry_after = self._retry_after(response)
+
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.max_retry_after))
+
+        return delay
+
+    def _retry_after(self, response: httpx.Response) -> float | None:
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+
+        # Retry-After is either an amount of seconds or a HTTP date
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+
+        return max((date - datetime.now(timezone.utc)).total_seconds(), 0)
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+
+class _Call:
+    done: threading.Event
+    value: Any
+    error: BaseException | None
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical calls of concurrent threads. The first caller of a
+    key does the call, the callers that arrive while it is in flight wait
+    for it and share its result or exception.
+    """
+
+    shared: int
+    _calls: Dict[Hashable, _Call]
+
+    def __init__(self):
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: Hashable | None, fn: Callable[[], T]) -> T:
+        if key is None:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if leader:
+            try:
+                call.value = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+
+        return call.value
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces identical calls of concurrent tasks. The first caller of a key
+    does the call, the callers that arrive while it is in flight await it
+    and share its result or exception.
+    """
+
+    shared: int
+    _calls: Dict[Hashable, asyncio.Future]
+
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+
+    async def do(
+        self, key: Hashable | None, fn: Callable[[], Awaitable[T]]
+    ) -> T:
+        if key is None:
+            return await fn()
+
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            # A cancelled waiter must not cancel the call of the others
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+
+        try:
+            value = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._calls[key]
@@ -0,0 +1,80 @@
+from functools import reduce
+from operator import or_
+from typing import Dict, Iterator, List, Tuple
+
+from excludarr.modules.justwatch.models import Offer
+
+
+class ProviderMask:
+    """
+    Maps each configured provider to a bit, the providers of an episode are
+    stored as a single int with the bits of the providers it streams on.
+    """
+
+    bits: Dict[int, int]
+    names: List[str]
+    all: int
+
+    def __init__(self, jw_providers: Dict):
+        self.bits = {}
+        self.names = []
+
+        for bit, (provider_id, details) in enumerate(jw_providers.items()):
+            self.bits[provider_id] = 1 << bit
+            self.names.append(details["clear_name"])
+
+        self.all = (1 << len(self.names)) - 1
+
+    def of(self, offers: List[Offer]) -> int:
+        bits = self.bits
+        return reduce(or_, [bits.get(offer.id, 0) for offer in offers], 0)
+
+    def names_of(self, mask: int) -> List[str]:
+        return [
+            name for bit, name in enumerate(self.names) if mask & (1 << bit)
+        ]
+
+
+class AvailabilityMatrix:
+    """
+    Provider masks of the episodes of a single show, indexed by season and
+    episode number.
+    """
+
+    seasons: Dict[int, Dict[int, int]]
+
+    def __init__(self):
+        self.seasons = {}
+
+    def set(self, season: int, episode: int, mask: int):
+        self.seasons.setdefault(season, {})[episode] = mask
+
+    def get(self, season: int, episode: int) -> int:
+        return self.seasons.get(season, {}).get(episode, 0)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int]]:
+        for season, episodes in self.seasons.items():
+            for episode, mask in episodes.items():
+                yield (season, episode, mask)
+
+    def streaming_count(self, season: int, mask: int) -> int:
+        """
+        The amount of episodes of the season that stream on one of the
+        providers in the mask.
+        """
+        episodes = self.seasons.get(season, {}).values()
+        return sum(map(bool, map(mask.__and__, episodes)))
+
+    def missing_count(self, season: int, mask: int) -> int:
+        """
+        The amount of episodes of the season that stream on none of the
+        providers in the mask.
+        """
+        episodes = self.seasons.get(season, {})
+        return len(episodes) - self.streaming_count(season, mask)
+
+    def season_mask(self, season: int) -> int:
+        """
+        The providers that stream at least one episode of the season.
+        """
+        return reduce(or_, self.seasons.get(season, {}).values(), 0)
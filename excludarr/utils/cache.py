@@ -0,0 +1,94 @@
+import sqlite3
+
+from typing import Callable, TypeVar
+from loguru import logger
+
+from excludarr.modules.justwatch.cache import (
+    MetadataCache,
+    OfferCache,
+    ResolutionIndex,
+    UnmatchedCache,
+)
+from excludarr.utils.config import Config
+
+T = TypeVar("T")
+
+
+def _open_store(config: Config, name: str, open: Callable[[], T]) -> T | None:
+    if not config.cache_enabled:
+        logger.debug(f"The {name} is disabled")
+        return None
+
+    logger.debug(f"Opening the {name} at: {config.cache_path}")
+
+    try:
+        return open()
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(
+            f"Could not open the {name} at {config.cache_path}, continuing without it: {e}"  # noqa: E501
+        )
+        return None
+
+
+def get_offer_cache(config: Config) -> OfferCache | None:
+    """
+    Setup the persistent JustWatch offer cache based on the configuration.
+    Returns None if the cache is disabled or could not be opened, in that
+    case Excludarr will just query JustWatch for every title.
+    """
+    return _open_store(
+        config,
+        "offer cache",
+        lambda: OfferCache(
+            config.cache_path,
+            movie_ttl=config.cache_movie_offers_ttl * 60 * 60,
+            show_ttl=config.cache_show_offers_ttl * 60 * 60,
+            max_entries=config.cache_max_entries,
+        ),
+    )
+
+
+def get_resolution_index(config: Config) -> ResolutionIndex | None:
+    """
+    Setup the index of external IDs to JustWatch IDs, it is stored in the
+    same database as the offer cache. Returns None if the cache is disabled
+    or could not be opened.
+    """
+    return _open_store(
+        config,
+        "resolution index",
+        lambda: ResolutionIndex(config.cache_path),
+    )
+
+
+def get_unmatched_cache(config: Config) -> UnmatchedCache | None:
+    """
+    Setup the cache of titles that could not be matched on JustWatch, it is
+    stored in the same database as the offer cache. Returns None if the
+    cache is disabled or could not be opened.
+    """
+    return _open_store(
+        config,
+        "unmatched cache",
+        lambda: UnmatchedCache(
+            config.cache_path,
+            retry_delays=[
+                hours * 60 * 60 for hours in config.cache_unmatched_retry
+            ],
+        ),
+    )
+
+
+def get_metadata_cache(config: Config) -> MetadataCache | None:
+    """
+    Setup the cache of the JustWatch locales and providers, it is stored in
+    the same database as the offer cache. Returns None if the cache is
+    disabled or could not be opened.
+    """
+    return _open_store(
+        config,
+        "metadata cache",
+        lambda: MetadataCache(
+            config.cache_path, ttl=config.cache_metadata_ttl * 60 * 60
+        ),
+    )
@@ -13,13 +13,27 @@ class NoConfigException(Exception):
     pass
 
 
+def _workers(section, default):
+    workers = section.get("workers", default)
+
+    try:
+        return max(1, int(workers))
+    except (TypeError, ValueError):
+        logger.warning(
+            f"Invalid amount of workers: {workers}, using {default} instead"
+        )
+        return default
+
+
 class Config:
 
     _config: Dict
+    _config_file: str | None
 
     def __init__(self):
         self.__class__ = Config
         self._config = {}
+        self._config_file = None
 
         possible_locations = (
             "/etc/excludarr/excludarr.yml",
@@ -53,6 +67,9 @@ class Config:
     def load(self, config_file):
         logger.debug(f"Reading configfile: {config_file}")
 
+        if not isinstance(config_file, IOBase):
+            self._config_file = config_file
+
         if isinstance(config_file, IOBase):
             self._config = safe_load(config_file)
         else:
@@ -82,6 +99,21 @@ class Config:
     def sonarr_section(self):
         return self._config.get("sonarr", {})
 
+    @property
+    def cache_section(self):
+        return self._config.get("cache", {})
+
+    @property
+    def justwatch_section(self):
+        return self._config.get("justwatch", {})
+
+    @property
+    def config_dir(self):
+        if self._config_file is None:
+            return f"{Path.home()}/.config/excludarr"
+
+        return str(Path(self._config_file).parent)
+
     @property
     def locale(self):
         return self.general_section.get("locale", None)
@@ -98,6 +130,10 @@ class Config:
     def tmdb_api_key(self):
         return self.tmdb_section.get("api_key", None)
 
+    @property
+    def tmdb_concurrency(self):
+        return self.tmdb_section.get("concurrency", 4)
+
     @property
     def radarr_url(self):
         return self.radarr_section.get("url", None)
@@ -118,6 +154,10 @@ class Config:
     def radarr_tags_to_exclude(self):
         return self.radarr_section.get("tags_to_exclude", [])
 
+    @property
+    def radarr_workers(self):
+        return _workers(self.radarr_section, 8)
+
     @property
     def sonarr_url(self):
         return self.sonarr_section.get("url", None)
@@ -137,3 +177,63 @@ class Config:
     @property
     def sonarr_tags_to_exclude(self):
         return self.sonarr_section.get("tags_to_exclude", [])
+
+    @property
+    def sonarr_workers(self):
+        return _workers(self.sonarr_section, 8)
+
+    @property
+    def sonarr_concurrency(self):
+        return self.sonarr_section.get("concurrency", 4)
+
+    @property
+    def cache_enabled(self):
+        return self.cache_section.get("enabled", True)
+
+    @property
+    def cache_path(self):
+        return self.cache_section.get("path", f"{self.config_dir}/cache.db")
+
+    @property
+    def cache_movie_offers_ttl(self):
+        return self.cache_section.get("movie_offers_ttl", 24)
+
+    @property
+    def cache_show_offers_ttl(self):
+        return self.cache_section.get("show_offers_ttl", 24)
+
+    @property
+    def cache_max_entries(self):
+        return self.cache_section.get("max_entries", 50000)
+
+    @property
+    def cache_metadata_ttl(self):
+        return self.cache_section.get("metadata_ttl", 168)
+
+    @property
+    def cache_unmatched_retry(self):
+        return self.cache_section.get("unmatched_retry", [24, 168, 720])
+
+    @property
+    def justwatch_retries(self):
+        return self.justwatch_section.get("retries", 5)
+
+    @property
+    def justwatch_backoff_factor(self):
+        return self.justwatch_section.get("backoff_factor", 0.5)
+
+    @property
+    def justwatch_max_backoff(self):
+        return self.justwatch_section.get("max_backoff", 30)
+
+    @property
+    def justwatch_rate_limit(self):
+        return self.justwatch_section.get("rate_limit", 10)
+
+    @property
+    def justwatch_max_concurrency(self):
+        return self.justwatch_section.get("max_concurrency", 32)
+
+    @property
+    def justwatch_episode_page_size(self):
+        return self.justwatch_section.get("episode_page_size", 100)
@@ -0,0 +1,69 @@
+from typing import Collection, Dict, Iterable, Iterator, List, Tuple
+
+
+class EpisodeIndex:
+    """
+    The episodes of a single serie in Sonarr, indexed by season and episode
+    number.
+    """
+
+    episodes: Dict[Tuple[int, int], List[Dict]]
+
+    def __init__(self, episodes: Iterable):
+        self.episodes = {}
+
+        for episode in episodes:
+            key = (episode["seasonNumber"], episode["episodeNumber"])
+            self.episodes.setdefault(key, []).append(episode)
+
+    def get(self, season: int, episode: int) -> List[Dict]:
+        return self.episodes.get((season, episode), [])
+
+    def __len__(self) -> int:
+        return sum(map(len, self.episodes.values()))
+
+
+class SerieEpisodes:
+    """
+    The selected episodes of a single serie, grouped by season in the order
+    they were added.
+    """
+
+    seasons: Dict[int, List[Dict]]
+
+    def __init__(self):
+        self.seasons = {}
+
+    def add(self, episode: Dict):
+        self.seasons.setdefault(episode["season"], []).append(episode)
+
+    def count(self, season: int) -> int:
+        return len(self.seasons.get(season, []))
+
+    def __iter__(self) -> Iterator[Dict]:
+        for episodes in self.seasons.values():
+            yield from episodes
+
+    def __len__(self) -> int:
+        return sum(map(len, self.seasons.values()))
+
+    def without_seasons(self, seasons: Collection[int]) -> List[Dict]:
+        """
+        The episodes of all seasons except the given ones.
+        """
+        return [
+            episode
+            for season, episodes in self.seasons.items()
+            if season not in seasons
+            for episode in episodes
+        ]
+
+    def episode_ids(self) -> List[int]:
+        """
+        The Sonarr IDs of the episodes that are known in Sonarr.
+        """
+        return [
+            episode["episode_id"]
+            for episode in self
+            if episode.get("episode_id", False)
+        ]
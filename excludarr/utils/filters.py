@@ -2,6 +2,7 @@ import datetime
 import itertools
 
 from ..modules.justwatch.models import Offer
+from .episodes import EpisodeIndex
 
 
 def flatten(lst):
@@ -110,33 +111,29 @@ def get_filesize_gb(filesize):
     return "%.2f" % filesize_gb + "GB"
 
 
-def get_episode_data(episodes, season_number, episode_number):
+def get_episode_data(
+    episode_index: EpisodeIndex, season_number, episode_number
+):
     episode_data = {}
 
-    for episode in episodes:
-        if (
-            season_number == episode["seasonNumber"]
-            and episode_number == episode["episodeNumber"]
-        ):
-            episode_data = {
-                "episode_id": episode["id"],
-                "monitored": episode["monitored"],
-                "has_file": episode.get("hasFile", False),
-            }
-            break
+    for episode in episode_index.get(season_number, episode_number):
+        episode_data = {
+            "episode_id": episode["id"],
+            "monitored": episode["monitored"],
+            "has_file": episode.get("hasFile", False),
+        }
+        break
 
     return episode_data
 
 
-def get_episode_file_id(episodes, season_number, episode_number):
+def get_episode_file_id(
+    episode_index: EpisodeIndex, season_number, episode_number
+):
     episode_file_ids = []
 
-    for episode in episodes:
-        if (
-            season_number == episode["seasonNumber"]
-            and episode_number == episode["episodeNumber"]
-            and episode.get("hasFile", False)
-        ):
+    for episode in episode_index.get(season_number, episode_number):
+        if episode.get("hasFile", False):
             episode_file_ids.append(episode["episodeFileId"])
 
     return episode_file_ids
@@ -0,0 +1,27 @@
+from excludarr.modules.justwatch.ratelimit import RateLimiter
+from excludarr.modules.justwatch.retry import RetryPolicy
+from excludarr.utils.config import Config
+
+
+def get_retry_policy(config: Config) -> RetryPolicy:
+    """
+    Setup the retry policy of the JustWatch client based on the
+    configuration.
+    """
+    return RetryPolicy(
+        total=config.justwatch_retries,
+        backoff_factor=config.justwatch_backoff_factor,
+        max_backoff=config.justwatch_max_backoff,
+    )
+
+
+def get_rate_limiter(config: Config) -> RateLimiter:
+    """
+    Setup the rate limiter of the JustWatch client based on the
+    configuration.
+    """
+    return RateLimiter(
+        rate=config.justwatch_rate_limit,
+        burst=max(config.justwatch_rate_limit, 1),
+        max_concurrency=config.justwatch_max_concurrency,
+    )
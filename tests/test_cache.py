@@ -0,0 +1,112 @@
+import pytest
+
+import excludarr.modules.justwatch.cache as cache
+from excludarr.modules.justwatch.cache import OfferCache, UnmatchedCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+
+    return clock
+
+
+def test_offer_cache_expires_after_ttl(clock):
+    offers = OfferCache(":memory:")
+
+    offers.set("movie", {"id": "tm1"}, 10)
+    assert offers.get("movie") == {"id": "tm1"}
+
+    clock.advance(10)
+    assert offers.get("movie") == {"id": "tm1"}
+
+    clock.advance(1)
+    assert offers.get("movie") is None
+    assert (offers.stats.hits, offers.stats.misses) == (2, 1)
+
+
+def test_offer_cache_evicts_least_recently_used(clock):
+    offers = OfferCache(":memory:", max_entries=2)
+    offers._evict_interval = 1
+
+    offers.set("a", 1, 100)
+    clock.advance(1)
+    offers.set("b", 2, 100)
+    clock.advance(1)
+
+    # Reading a makes b the least recently used entry
+    assert offers.get("a") == 1
+    clock.advance(1)
+    offers.set("c", 3, 100)
+
+    assert offers.get("b") is None
+    assert (offers.get("a"), offers.get("c")) == (1, 3)
+    assert offers.stats.evictions == 1
+
+
+def test_offer_cache_evicts_every_interval(clock):
+    offers = OfferCache(":memory:", max_entries=1)
+    offers._evict_interval = 3
+
+    for key in ["a", "b"]:
+        offers.set(key, key, 100)
+        clock.advance(1)
+    assert offers.stats.evictions == 0
+
+    offers.set("c", "c", 100)
+    assert offers.stats.evictions == 2
+    assert offers.get("c") == "c"
+
+
+def test_unmatched_cache_backs_off(clock):
+    unmatched = UnmatchedCache(":memory:", retry_delays=[10, 100])
+
+    assert not unmatched.should_skip("MOVIE", "tmdb", 1)
+
+    unmatched.add_failure("MOVIE", "tmdb", 1)
+    assert unmatched.should_skip("MOVIE", "tmdb", 1)
+    assert not unmatched.should_skip("MOVIE", "tmdb", 2)
+    assert not unmatched.should_skip("SHOW", "tmdb", 1)
+
+    clock.advance(11)
+    assert not unmatched.should_skip("MOVIE", "tmdb", 1)
+
+    # Every failure uses the next delay until the last one is reached
+    for _ in range(2):
+        unmatched.add_failure("MOVIE", "tmdb", 1)
+        clock.advance(99)
+        assert unmatched.should_skip("MOVIE", "tmdb", 1)
+        clock.advance(2)
+        assert not unmatched.should_skip("MOVIE", "tmdb", 1)
+
+
+def test_unmatched_cache_remove(clock):
+    unmatched = UnmatchedCache(":memory:", retry_delays=[10])
+
+    unmatched.add_failure("SHOW", "tvdb", 5)
+    unmatched.remove("SHOW", "tvdb", 5)
+    assert not unmatched.should_skip("SHOW", "tvdb", 5)
+
+    # A title that failed again after its removal starts over
+    unmatched.add_failure("SHOW", "tvdb", 5)
+    clock.advance(11)
+    assert not unmatched.should_skip("SHOW", "tvdb", 5)
+
+
+def test_unmatched_cache_ignores_missing_ids(clock):
+    unmatched = UnmatchedCache(":memory:")
+
+    unmatched.add_failure("MOVIE", "imdb", None)
+    assert not unmatched.should_skip("MOVIE", "imdb", None)
@@ -0,0 +1,308 @@
+import json
+
+import httpx
+import pytest
+
+from excludarr.modules.justwatch import JustWatch
+from excludarr.modules.justwatch.exceptions import JustWatchGraphqlError
+from excludarr.modules.justwatch.retry import RetryPolicy
+
+LOCALES = [{"full_locale": "en_US", "iso_3166_2": "US"}]
+
+
+def offer(package_id, element_count=1):
+    return {
+        "__typename": "Offer",
+        "monetizationType": "FLATRATE",
+        "presentationType": "HD",
+        "elementCount": element_count,
+        "package": {
+            "id": "p",
+            "packageId": package_id,
+            "clearName": "Netflix",
+            "shortName": "nfx",
+            "technicalName": "netflix",
+            "__typename": "Package",
+        },
+    }
+
+
+def episode(number, offers=[]):
+    return {"content": {"episodeNumber": number}, "offers": offers}
+
+
+def season(id, number, total, offers, episodes=[]):
+    return {
+        "id": id,
+        "totalEpisodeCount": total,
+        "content": {"seasonNumber": number},
+        "offers": offers,
+        "episodes": episodes,
+    }
+
+
+class MockJustWatch:
+    """
+    Answers the requests of a JustWatch client, every GraphQL request is
+    passed to handler with its JSON body.
+    """
+
+    def __init__(self, monkeypatch, handler):
+        self.handler = handler
+        self.bodies = []
+
+        client = httpx.Client
+        transport = httpx.MockTransport(self.respond)
+        monkeypatch.setattr(
+            httpx,
+            "Client",
+            lambda *args, http2=False, **kwargs: client(
+                *args, transport=transport, **kwargs
+            ),
+        )
+
+    def respond(self, request):
+        if request.method == "GET":
+            return httpx.Response(200, json=LOCALES)
+
+        body = json.loads(request.content)
+        self.bodies.append(body)
+
+        return self.handler(body)
+
+
+@pytest.fixture
+def justwatch(monkeypatch):
+    def make(handler, persisted_queries=False):
+        mock = MockJustWatch(monkeypatch, handler)
+        client = JustWatch("US", retry_policy=RetryPolicy(total=0))
+        client.persisted_queries = persisted_queries
+
+        return client, mock
+
+    return make
+
+
+def node_ids(body):
+    return [
+        body["variables"][f"nodeId{i}"]
+        for i in range(len(body["variables"]))
+        if f"nodeId{i}" in body["variables"]
+    ]
+
+
+def offers_batch(body, bad=[]):
+    """
+    Answers a batch of title offers, the nodes in bad fail the whole batch.
+    """
+    ids = node_ids(body)
+
+    if any([id in bad for id in ids]):
+        return httpx.Response(
+            200, json={"errors": [{"message": "broken"}], "data": None}
+        )
+
+    return httpx.Response(
+        200,
+        json={
+            "data": {
+                f"n{i}": {"id": id, "offers": [offer(8)]}
+                for i, id in enumerate(ids)
+            }
+        },
+    )
+
+
+def test_many_flow_splits_batch_until_single_failing_item(justwatch):
+    client, mock = justwatch(lambda body: offers_batch(body, bad=["tm2"]))
+
+    offers = client.query_movie_offers_many(
+        ["tm1", "tm2", "tm3", "tm4"], lean=True
+    )
+
+    assert offers["tm2"] is None
+    assert [len(offers[id]) for id in ["tm1", "tm3", "tm4"]] == [1, 1, 1]
+
+    # The failing batch is split until the failing item is on its own
+    batches = [node_ids(body) for body in mock.bodies]
+    assert batches[0] == ["tm1", "tm2", "tm3", "tm4"]
+    assert ["tm2"] in batches
+
+
+def test_many_flow_keeps_aliases_of_partially_failed_batch(justwatch):
+    def handler(body):
+        return httpx.Response(
+            200,
+            json={
+                "errors": [{"message": "broken", "path": ["n1"]}],
+                "data": {
+                    "n0": {"id": "tm1", "offers": [offer(8)]},
+                    "n1": None,
+                    "n2": {"id": "tm3", "offers": []},
+                },
+            },
+        )
+
+    client, mock = justwatch(handler)
+
+    offers = client.query_movie_offers_many(["tm1", "tm2", "tm3"], lean=True)
+
+    assert offers == {"tm1": offers["tm1"], "tm2": None, "tm3": []}
+    assert len(offers["tm1"]) == 1
+    assert len(mock.bodies) == 1
+
+
+def test_many_flow_removes_duplicates(justwatch):
+    client, mock = justwatch(offers_batch)
+
+    offers = client.query_movie_offers_many(["tm1", "tm1", "tm2"], lean=True)
+
+    assert list(offers) == ["tm1", "tm2"]
+    assert [node_ids(body) for body in mock.bodies] == [["tm1", "tm2"]]
+
+
+def persisted_handler(error):
+    def handler(body):
+        if "query" not in body:
+            return httpx.Response(
+                200,
+                json={"errors": [{"message": error}], "data": None},
+            )
+
+        return offers_batch(body)
+
+    return handler
+
+
+def test_persisted_query_not_found_sends_document(justwatch):
+    client, mock = justwatch(
+        persisted_handler("PersistedQueryNotFound"), persisted_queries=True
+    )
+
+    offers = client.query_movie_offers_many(["tm1"], lean=True)
+
+    assert len(offers["tm1"]) == 1
+    assert ["query" in body for body in mock.bodies] == [False, True]
+
+    # The document is sent along with its hash, so JustWatch can store it
+    assert "extensions" in mock.bodies[1]
+    assert client.persisted_queries is True
+
+
+def test_persisted_query_not_supported_disables_persisted_queries(
+    justwatch,
+):
+    client, mock = justwatch(
+        persisted_handler("PersistedQueryNotSupported"),
+        persisted_queries=True,
+    )
+
+    client.query_movie_offers_many(["tm1"], lean=True)
+    client.query_movie_offers_many(["tm2"], lean=True)
+
+    assert ["query" in body for body in mock.bodies] == [False, True, True]
+    assert "extensions" not in mock.bodies[1]
+    assert client.persisted_queries is False
+
+
+def test_persisted_query_other_errors_are_raised(justwatch):
+    client, mock = justwatch(
+        persisted_handler("Unknown argument"), persisted_queries=True
+    )
+
+    offers = client.query_movie_offers_many(["tm1"], lean=True)
+
+    # The error is not retried with the full document
+    assert offers == {"tm1": None}
+    assert all(["query" not in body for body in mock.bodies])
+    assert client.persisted_queries is True
+
+
+@pytest.mark.parametrize(
+    "errors,missing",
+    [
+        ([{"message": "PersistedQueryNotFound"}], True),
+        ([{"extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}], True),
+        ([{"message": "PersistedQueryNotSupported"}], True),
+        ([{"message": "Cannot query field"}], False),
+        ([{"message": "Internal server error"}], False),
+    ],
+)
+def test_persisted_query_missing(justwatch, errors, missing):
+    client, _ = justwatch(offers_batch)
+
+    error = JustWatchGraphqlError(None, errors)
+
+    assert client._persisted_query_missing(error) is missing
+
+
+def test_is_partial_season(justwatch):
+    client, _ = justwatch(offers_batch)
+
+    assert not client._is_partial_season(season("s1", 1, 5, [offer(8, 5)]))
+    assert client._is_partial_season(season("s1", 1, 5, [offer(8, 2)]))
+    assert client._is_partial_season(
+        season("s1", 1, 5, [offer(8, 5), offer(9, 4)])
+    )
+    assert client._is_partial_season(
+        season("s1", 1, 5, [{**offer(8), "elementCount": None}])
+    )
+    assert not client._is_partial_season(season("s1", 1, 5, []))
+
+
+def test_expand_shows_only_queries_partial_seasons(justwatch):
+    def handler(body):
+        assert body["operationName"] == "GetSeasonEpisodeOffersBatch"
+
+        return httpx.Response(
+            200,
+            json={
+                "data": {
+                    "n0": {
+                        "episodes": [
+                            episode(1, [offer(8)]),
+                            episode(2),
+                        ]
+                    }
+                }
+            },
+        )
+
+    client, mock = justwatch(handler)
+
+    show = {
+        "id": "ts1",
+        "seasons": [
+            season("s1", 1, 2, [offer(8, 2)], [episode(1), episode(2)]),
+            season("s2", 2, 2, [offer(8, 1)], [episode(1), episode(2)]),
+        ],
+    }
+
+    [expanded, missing] = client._run(
+        client._expand_shows_flow([show, None], [], False, True)
+    )
+
+    assert missing is None
+    assert [node_ids(body) for body in mock.bodies] == [["s2"]]
+
+    [full, partial] = expanded["seasons"]
+    assert [len(e["offers"]) for e in full["episodes"]] == [1, 1]
+    assert [len(e["offers"]) for e in partial["episodes"]] == [1, 0]
+
+
+def test_expand_shows_fails_show_of_failed_season(justwatch):
+    def handler(body):
+        return httpx.Response(
+            200, json={"errors": [{"message": "broken"}], "data": None}
+        )
+
+    client, _ = justwatch(handler)
+
+    show = {
+        "id": "ts1",
+        "seasons": [season("s1", 1, 2, [offer(8, 1)], [episode(1)])],
+    }
+
+    assert client._run(client._expand_shows_flow([show], [], False, True)) == [
+        None
+    ]
@@ -0,0 +1,66 @@
+import random
+import threading
+import time
+
+import pytest
+from rich.progress import Progress
+
+from excludarr.core.utils.scan import scan_entries
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_scan_entries_keeps_order_across_chunks(workers):
+    entries = list(range(25))
+    events = []
+    lock = threading.Lock()
+
+    def resolve(chunk):
+        with lock:
+            events.append(("resolve", list(chunk)))
+
+    def scan_entry(entry):
+        # Finish the entries out of order
+        time.sleep(random.random() / 1000)
+        with lock:
+            events.append(("scan", entry))
+
+        return entry * 2
+
+    with Progress(disable=True) as progress:
+        results = scan_entries(
+            entries, scan_entry, workers, progress, resolve, chunk_size=10
+        )
+
+    assert results == [entry * 2 for entry in entries]
+
+    # Every chunk is resolved before any of its entries is scanned, and
+    # after all the entries of the previous chunk are done
+    chunks = [event[1] for event in events if event[0] == "resolve"]
+    assert chunks == [entries[0:10], entries[10:20], entries[20:25]]
+    for chunk in chunks:
+        position = events.index(("resolve", chunk))
+        scanned = [
+            event[1] for event in events[:position] if event[0] == "scan"
+        ]
+        assert sorted(scanned) == entries[: chunk[0]]
+
+    assert progress.tasks[0].completed == len(entries)
+
+
+def test_scan_entries_stops_on_failure():
+    scanned = []
+
+    def scan_entry(entry):
+        scanned.append(entry)
+        if entry == 3:
+            raise ValueError(entry)
+
+        return entry
+
+    with Progress(disable=True) as progress:
+        with pytest.raises(ValueError):
+            scan_entries(
+                list(range(20)), scan_entry, 1, progress, chunk_size=5
+            )
+
+    assert scanned == [0, 1, 2, 3]